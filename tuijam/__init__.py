@@ -8,5 +8,16 @@ CONFIG_FILE = join(CONFIG_DIR, "config.yaml")
 LOG_FILE = join(CONFIG_DIR, "log.txt")
 HISTORY_FILE = join(CONFIG_DIR, "hist.json")
 QUEUE_FILE = join(CONFIG_DIR, "queue.json")
+QUEUE_JOURNAL_FILE = join(CONFIG_DIR, "queue.journal")
 CRED_FILE = join(CONFIG_DIR, "google_oauth.cred")
+METADATA_CACHE_FILE = join(CONFIG_DIR, "metadata_cache.json")
+KEY_CACHE_FILE = join(CONFIG_DIR, "keys.json")
+YOUTUBE_DISCOVERY_FILE = join(CONFIG_DIR, "youtube_discovery.json")
+SCROBBLE_FILE = join(CONFIG_DIR, "scrobbles.json")
+LIBRARY_INDEX_FILE = join(CONFIG_DIR, "library_index.json")
+SEARCH_CACHE_FILE = join(CONFIG_DIR, "search_cache.json")
+LISTEN_NOW_FILE = join(CONFIG_DIR, "listen_now.json")
+PLAYLIST_CACHE_FILE = join(CONFIG_DIR, "playlists.json")
+ART_DIR = join(CONFIG_DIR, "art")
+AUDIO_CACHE_DIR = join(CONFIG_DIR, "audio")
 LOCALE_DIR = join(CONFIG_DIR, "lang")
@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 # coding=utf-8
-from os.path import join, isfile
+from time import perf_counter
+
+IMPORT_START = perf_counter()
+
+from os.path import join, isfile, getmtime
 from os import makedirs
+from functools import partial
+from itertools import islice
 import sys
 import locale
+import threading
+import time
 
 import logging
 import urwid
-import gmusicapi
-import yaml
 
 from .music_objects import (
     Song,
@@ -19,18 +25,58 @@ from .music_objects import (
     Playlist,
     YTVideo,
 )
-from .music_objects import serialize, deserialize
-from .ui import SearchInput, SearchPanel, QueuePanel, PlayBar, controls, palette
+from .music_objects import serialize, deserialize, encode, decode
+from .ui import SearchInput, SearchPanel, QueuePanel, PlayBar, FrameLoop, controls, palette
+from .ui import PAGE_SIZE
 from tuijam import CONFIG_DIR, CONFIG_FILE, QUEUE_FILE, HISTORY_FILE, CRED_FILE, LOCALE_DIR, _
-from tuijam.utility import lookup_keys
+from tuijam import METADATA_CACHE_FILE, QUEUE_JOURNAL_FILE, YOUTUBE_DISCOVERY_FILE
+from tuijam import SCROBBLE_FILE, KEY_CACHE_FILE, LIBRARY_INDEX_FILE, SEARCH_CACHE_FILE
+from tuijam import LISTEN_NOW_FILE, PLAYLIST_CACHE_FILE, ART_DIR, AUDIO_CACHE_DIR, net
+from tuijam.utility import lookup_keys, StartupTimer, RecentSet, KEY_SERVER
+from tuijam.worker import Worker
+from tuijam.stream_urls import StreamUrlCache
+from tuijam.cache import PersistentCache
+from tuijam.journal import QueueJournal
+from tuijam.library import LibraryIndex, SearchCache, merge
+from tuijam.art import ArtCache, art_url
+from tuijam.audio_cache import AudioCache
 
 from .lastfm import LastFMAPI
 
+IMPORT_TIME = perf_counter() - IMPORT_START
+
+# How many seconds before the end of a song the next one is handed to mpv
+# in gapless mode.
+GAPLESS_PRELOAD = 20
+
+# Refetch the cached YouTube API discovery document after this many seconds.
+DISCOVERY_TTL = 30 * 24 * 60 * 60
+
+# The Listen Now screen is made of these Mobileclient calls. They are made in
+# parallel, and the screen is not refreshed if it is younger than
+# LISTEN_NOW_FRESH seconds.
+LISTEN_NOW_CALLS = (
+    "get_listen_now_situations",
+    "get_listen_now_items",
+    "get_all_playlists",
+    "get_top_songs",
+)
+LISTEN_NOW_FRESH = 5 * 60
+
+# Endless radio fetches RADIO_BATCH more songs when the queue runs low, and
+# tells the server about the last RADIO_RECENT songs played to avoid repeats.
+RADIO_BATCH = 25
+RADIO_RECENT = 50
+
+# Art of this many upcoming queue entries is downloaded ahead of time.
+ART_PREFETCH = 3
+
 
 class App(urwid.Pile):
     def __init__(self):
         import mpv
 
+        self.startup = StartupTimer()
         self.player = mpv.MPV()
         self.player.volume = 100
         self.player["vid"] = "no"
@@ -41,19 +87,76 @@ class App(urwid.Pile):
         self.reached_end_of_track = False
         self.lastfm = None
         self.youtube = None
+        self.youtube_lock = threading.Lock()
         self.mpris = None
+        self.worker = Worker()
+        self.search_generation = 0
+        self.search_futures = []
+        self.search_cache = SearchCache()
+        self.stream_urls = StreamUrlCache(self)
+        self.metadata = PersistentCache(METADATA_CACHE_FILE)
+        self.queue_journal = QueueJournal(QUEUE_FILE, QUEUE_JOURNAL_FILE)
+        self.last_time_pos = 0
+        self.recovering = None
+        self.preloaded = None  # queue head handed to mpv ahead of time
+        self.library = None
+        self.radio_station = None  # station refilling the queue, if any
+        self.radio_loading = False
+        self.recently_played = RecentSet()
+        self.art = ArtCache(ART_DIR, self.worker)
+        self.audio_cache = AudioCache(AUDIO_CACHE_DIR)
+        self.listen_now_cache = PersistentCache(
+            LISTEN_NOW_FILE, max_entries=1, ttl=7 * 24 * 60 * 60
+        )
+        self.listen_now_loading = False
+        self.listen_now_fetched = 0
+        self.playlists = PersistentCache(
+            PLAYLIST_CACHE_FILE, max_entries=100, ttl=30 * 24 * 60 * 60
+        )
+        self.listen_now_results = None  # the Listen Now screen being shown
+        self.listen_now_generation = None  # search generation waiting for it
         self.vim_mode = None
         self.vim_insert = False
 
+        self.time_pos = None
+        self.duration = None
+        self.shown_second = None
+
+        # mpv reports progress through property observers on its own thread.
+        # The UI is only woken up when the displayed time would change.
+        @self.player.property_observer("time-pos")
+        def time_pos_observer(_name, value):
+            self.time_pos = value
+            second = None if value is None else int(value)
+            if second != self.shown_second:
+                self.shown_second = second
+                self.worker.call_soon(self.refresh)
+
+        @self.player.property_observer("duration")
+        def duration_observer(_name, value):
+            self.duration = value
+            self.worker.call_soon(self.refresh)
+
         @self.player.event_callback("end_file")
         def end_file_callback(event):
 
             if event["event"]["reason"] == 0:
 
-                self.reached_end_of_track = True
                 if self.lastfm:
                     self.current_song.lastfm_scrobbled = False
-                self.schedule_refresh(dt=0.01)
+                if isinstance(self.current_song, Song):
+                    self.worker.call_soon(self.audio_cache.finish, self.current_song.id)
+
+                preloaded = self.preloaded
+                if preloaded is not None:
+                    # mpv moves on to the preloaded entry by itself
+                    self.worker.call_soon(self.advance_preloaded, preloaded)
+                else:
+                    self.reached_end_of_track = True
+                    self.worker.call_soon(self.refresh)
+
+            elif event["event"]["reason"] == 4:  # error, e.g. an expired stream URL
+                self.worker.call_soon(self.recover_stream)
 
         self.search_panel = SearchPanel(self)
         search_panel_wrapped = urwid.LineBox(self.search_panel, title=_("Search Results"))
@@ -102,43 +205,127 @@ class App(urwid.Pile):
             return self.history.pop(0)
 
     def login(self):
-        self.g_api = gmusicapi.Mobileclient(debug_logging=False)
-        self.load_config()
+        with self.startup.phase("imports"):
+            import gmusicapi
+
+        with self.startup.phase("config"):
+            self.load_config()
+
+        if self.http_warmup:
+            # Handshakes with the hosts we are about to talk to overlap with
+            # the Google login.
+            self.warm_up_connections()
+
+        with self.startup.phase("login"):
+            self.g_api = gmusicapi.Mobileclient(debug_logging=False)
+
+            if not isfile(CRED_FILE):
+                from oauth2client.client import FlowExchangeError
+
+                print(_("No local credentials file found."))
+                print(_("TUIJam will now open a browser window so you can provide"))
+                print(_("permission for TUIJam to access your Google Play Music account."))
+                input(_("Press enter to continue."))
+                try:
+                    self.g_api.perform_oauth(CRED_FILE, open_browser=True)
+                except FlowExchangeError:
+                    raise RuntimeError(_("Oauth authentication Failed."))
+
+            self.g_api.oauth_login(self.g_api.FROM_MAC_ADDRESS, CRED_FILE,
+                                   locale=locale.getdefaultlocale()[0])
+
+        with self.startup.phase("keys"):
+            if self.lastfm_sk is not None:
+                try:
+                    self.lastfm = LastFMAPI(self.lastfm_sk)
+                    self.lastfm.start_scrobbler(SCROBBLE_FILE)
+                except Exception:
+                    print(_("Could not retrieve Last.fm keys."))
+                    print(_("Scrobbling will not be available."))
+                # TODO handle if sk is invalid
 
-        if not isfile(CRED_FILE):
-            from oauth2client.client import FlowExchangeError
+            try:
+                developer_key, = lookup_keys("GOOGLE_DEVELOPER_KEY")
+            except Exception:
+                developer_key = None
 
-            print(_("No local credentials file found."))
-            print(_("TUIJam will now open a browser window so you can provide"))
-            print(_("permission for TUIJam to access your Google Play Music account."))
-            input(_("Press enter to continue."))
+        with self.startup.phase("youtube"):
             try:
-                self.g_api.perform_oauth(CRED_FILE, open_browser=True)
-            except FlowExchangeError:
-                raise RuntimeError(_("Oauth authentication Failed."))
+                self.youtube = self.build_youtube(developer_key)
+            except Exception as e:
+                logging.exception(e)
+                self.youtube = None
+                print(_("Could not retrieve YouTube key."))
+                print(_("YouTube will not be available."))
+
+        if self.library_index:
+            self.load_library()
+
+        # so that the first look at the home screen is instant
+        self.refresh_listen_now()
+
+    def load_library(self):
+        # The index on disk is usable right away; it is rebuilt from the
+        # library in the background once it gets old.
+        def use(index):
+            self.library = index
+
+        def load():
+            index = LibraryIndex.load(LIBRARY_INDEX_FILE)
+            if index is not None:
+                self.worker.call_soon(use, index)
+
+            if index is None or index.stale(self.library_index_ttl):
+                index = LibraryIndex.build(self.g_api)
+                index.save(LIBRARY_INDEX_FILE)
+                logging.info(f"indexed {len(index)} library songs")
+
+            return index
 
-        self.g_api.oauth_login(self.g_api.FROM_MAC_ADDRESS, CRED_FILE,
-                               locale=locale.getdefaultlocale()[0])
+        self.worker.submit_long(load, callback=use)
+
+    def warm_up_connections(self):
+        urls = []
 
         if self.lastfm_sk is not None:
-            try:
-                self.lastfm = LastFMAPI(self.lastfm_sk)
-            except Exception:
-                print(_("Could not retrieve Last.fm keys."))
-                print(_("Scrobbling will not be available."))
-            # TODO handle if sk is invalid
+            urls.append(LastFMAPI.API_ROOT_URL)
+
+        if not isfile(KEY_CACHE_FILE):
+            urls.append(self.key_server)
+
+        net.warm_up(self.worker, urls)
+
+    def build_youtube(self, developer_key):
+        # Building the client normally downloads the API discovery document,
+        # so keep a copy of it and build from that while it is recent.
+        import json
+        from apiclient.discovery import build, build_from_document
 
-        from apiclient.discovery import build
+        if developer_key is None:
+            raise RuntimeError("No YouTube developer key")
 
         try:
-            developer_key, = lookup_keys("GOOGLE_DEVELOPER_KEY")
-            self.youtube = build("youtube", "v3", developerKey=developer_key)
-        except Exception:
-            self.youtube = None
-            print(_("Could not retrieve YouTube key."))
-            print(_("YouTube will not be available."))
+            if time.time() - getmtime(YOUTUBE_DISCOVERY_FILE) < DISCOVERY_TTL:
+                with open(YOUTUBE_DISCOVERY_FILE) as f:
+                    return build_from_document(f.read(), developerKey=developer_key)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring cached YouTube discovery document: {e}")
+
+        youtube = build(
+            "youtube", "v3", developerKey=developer_key, cache_discovery=False
+        )
+
+        try:
+            with open(YOUTUBE_DISCOVERY_FILE, "w") as f:
+                json.dump(youtube._rootDesc, f)
+        except (OSError, AttributeError) as e:
+            logging.exception(e)
+
+        return youtube
 
     def load_config(self):
+        import yaml
+
         if not isfile(CONFIG_FILE):
             with open(CONFIG_FILE, "w") as outfile:
                 yaml.safe_dump(
@@ -173,52 +360,208 @@ class App(urwid.Pile):
             self.video = config.get("video", False)
             self.vim_mode = config.get("vim_mode", False)
             self.use_terminal_colors = config.get("use_terminal_colors", False)
+            self.stream_urls.prefetch = config.get("stream_prefetch", 3)
+            self.gapless = config.get("gapless", False)
+            self.startup_budget = config.get("startup_budget", 3.0)
+            self.metadata.ttl = config.get("metadata_cache_ttl", 24 * 60 * 60)
+            self.metadata.max_entries = config.get("metadata_cache_size", 200)
+            self.key_server = config.get("key_server", KEY_SERVER)
+            self.http_warmup = config.get("http_warmup", True)
+            self.max_fps = config.get("max_fps", 30)
+            self.endless_radio = config.get("endless_radio", True)
+            self.radio_low_water = config.get("radio_low_water", 10)
+            self.art.max_bytes = config.get("art_cache_size", 50) * 1024 * 1024
+            self.audio_cache.max_bytes = config.get("audio_cache_size", 0) * 1024 * 1024
+            self.library_index = config.get("library_index", True)
+            self.search_as_you_type = config.get("search_as_you_type", False)
+            self.search_delay = config.get("search_delay", 0.3)
+            self.search_cache.ttl = config.get("search_cache_ttl", 60 * 60)
+            if config.get("search_cache_disk", False):
+                self.search_cache.spill = PersistentCache(
+                    SEARCH_CACHE_FILE, max_entries=500, ttl=self.search_cache.ttl
+                )
+            self.search_panel.history_size = config.get("search_history_size", 50)
+            self.library_index_ttl = config.get("library_index_ttl", 24 * 60 * 60)
+            net.configure(
+                timeout=config.get("http_timeout", net.TIMEOUT),
+                pool_size=config.get("http_pool_size", net.POOL_SIZE),
+            )
 
     def refresh(self, *args, **kwargs):
         if self.play_state == "play" and self.reached_end_of_track:
             self.reached_end_of_track = False
             self.queue_panel.play_next()
 
+        # The main loop redraws once it goes idle; the playbar is only
+        # invalidated when what it shows has changed.
         self.playbar.update()
-        self.loop.draw_screen()
+
+        song = self.current_song
+        progress, total = self.playbar.get_prog_tot()
+        if progress:
+            self.last_time_pos = progress
 
         if self.play_state == "play":
-            self.schedule_refresh()
+            self.stream_urls.keep_next_fresh(self.queue_panel.queue)
+
+        if self.gapless:
+            self.preload_next()
 
-        song = self.current_song
         if self.lastfm and isinstance(song, Song):
-            progress, _ = self.playbar.get_prog_tot()
             self.lastfm.scrobble_song(song, progress)
 
-    def schedule_refresh(self, dt=0.5):
-        self.loop.set_alarm_in(dt, self.refresh)
-
     def play(self, song):
+        options = {}
+
         try:
             if isinstance(song, Song):
-                song.stream_url = self.g_api.get_stream_url(song.id)
+                song.stream_url, options = self.song_source(song)
             else:  # YTVideo
                 song.stream_url = f"https://youtu.be/{song.id}"
         except Exception as e:
             logging.exception(e)
             return False
 
-        self.current_song = song
+        self.audio_cache.abandon(keep=song.id)
+        self.preloaded = None
         self.player.pause = True
-        self.player.play(self.current_song.stream_url)
+        self.player.loadfile(song.stream_url, **options)
         self.player.pause = False
+        self.now_playing(song)
+        return True
+
+    def song_source(self, song, resolve=True):
+        """The file or URL mpv should open for ``song``, and the options for it.
+
+        Songs in the audio cache are played from disk. Others are streamed and
+        recorded into the cache along the way. Returns (None, {}) if the stream
+        URL is not resolved yet and ``resolve`` is false.
+        """
+        path = self.audio_cache.get(song.id)
+        if path is not None:
+            return path, {}
+
+        url = self.stream_urls.resolve(song) if resolve else self.stream_urls.get(song)
+        if url is None:
+            return None, {}
+
+        record = self.audio_cache.record(song.id)
+        return url, {"stream_record": record} if record is not None else {}
+
+    def now_playing(self, song):
+        self.current_song = song
+        self.last_time_pos = 0
+        self.recovering = None
         self.play_state = "play"
         self.playbar.update()
-    
+
         self.history.insert(0, song)
         self.history = self.history[:100]
-    
-        self.schedule_refresh()
+        if isinstance(song, Song):
+            self.recently_played.add(song.id)
+
+        self.queue_changed()
+
+        song.lastfm_scrobbled = False
+        if self.lastfm and isinstance(song, Song):
+            self.lastfm.update_now_playing_song(song)
 
         if self.mpris:
             self.mpris.emit_property_changed("PlaybackStatus")
             self.mpris.emit_property_changed("Metadata")
-        return True
+
+    def queue_changed(self):
+        queue = self.queue_panel.queue
+
+        if self.play_state == "play":
+            self.stream_urls.prefetch_queue(queue)
+
+        if self.queue_panel.journal and self.queue_journal.needs_compaction(len(queue)):
+            self.queue_journal.compact(self.worker, self.current_song, queue)
+
+        if self.gapless:
+            self.preload_next()
+
+        if self.radio_station is not None:
+            self.refill_radio()
+
+        if self.mpris:
+            for attr in ("CanGoNext", "CanGoPrevious", "CanPlay"):
+                self.mpris.emit_property_changed(attr)
+
+            # art is only used by MPRIS clients
+            self.art.prefetch(art_url(obj) for obj in islice(queue, ART_PREFETCH))
+
+    def preload_next(self):
+        # In gapless mode the head of the queue is appended to mpv's playlist
+        # shortly before the current song ends, so mpv can open it in advance
+        # and move on without a pause.
+        queue = self.queue_panel.queue
+        head = queue[0] if len(queue) else None
+
+        if self.preloaded is not None and self.preloaded is not head:
+            self.player.playlist_clear()  # keeps the current entry
+            self.audio_cache.abandon(keep=getattr(self.current_song, "id", None))
+            self.preloaded = None
+
+        if head is None or self.preloaded is head or self.play_state != "play":
+            return
+
+        progress, total = self.playbar.get_prog_tot()
+        if not total or total - progress > GAPLESS_PRELOAD:  # duration not known yet
+            return
+
+        options = {}
+        if isinstance(head, Song):
+            url, options = self.song_source(head, resolve=False)
+            if url is None:
+                # not resolved yet, try again on the next refresh
+                self.stream_urls.prefetch_queue(queue)
+                return
+        else:  # YTVideo
+            url = f"https://youtu.be/{head.id}"
+
+        head.stream_url = url
+        self.player.playlist_append(url, **options)
+        self.preloaded = head
+
+    def advance_preloaded(self, song):
+        if self.preloaded is not song:  # playback was changed in the meantime
+            return
+
+        self.preloaded = None
+        queue = self.queue_panel.queue
+
+        if len(queue) and queue[0] is song:
+            self.queue_panel.pop_next()
+            self.now_playing(song)
+        else:
+            self.queue_panel.play_next()
+
+    def recover_stream(self):
+        # mpv failed to open the current song, most likely because its signed
+        # URL expired while paused. Resolve it again and resume where we were.
+        song = self.current_song
+        if not isinstance(song, Song) or self.play_state == "stop":
+            return
+
+        if self.recovering is song:  # already retried once, give up on it
+            self.recovering = None
+            self.queue_panel.play_next()
+            return
+
+        self.recovering = song
+        self.stream_urls.invalidate(song)
+        self.audio_cache.discard(song.id)  # in case the cached file is broken
+        position = self.last_time_pos
+
+        def restart(url):
+            if self.current_song is song:
+                song.stream_url = url
+                self.preloaded = None
+                self.player.loadfile(url, start=f"{position:.1f}")
+
+        self.worker.submit(self.stream_urls.resolve, song, callback=restart)
 
     def stop(self):
         try:
@@ -227,6 +570,9 @@ class App(urwid.Pile):
         except SystemError:  # seek throws error if there is no current song in mpv
             pass
 
+        if self.current_song is not None:
+            self.audio_cache.interrupt(self.current_song.id)
+
         self.play_state = "stop"
         self.playbar.update()
 
@@ -234,13 +580,26 @@ class App(urwid.Pile):
             self.mpris.emit_property_changed("PlaybackStatus")
 
     def seek(self, dt):
+        self.seek_to((self.time_pos or 0) + dt)
+
+    def seek_to(self, position):
+        if self.duration:
+            position = min(position, self.duration)
+        position = max(position, 0)
+
         try:
-            self.player.seek(dt)
+            self.player.seek(position, reference="absolute")
         except SystemError:
-            pass
+            return
 
+        if self.current_song is not None:
+            self.audio_cache.interrupt(self.current_song.id)
+        self.time_pos = position
         self.playbar.update()
 
+        if self.mpris:
+            self.mpris.emit_seeked(position)
+
     def toggle_play(self):
         if self.play_state == "play":
             self.player.pause = True
@@ -253,7 +612,6 @@ class App(urwid.Pile):
             self.player.pause = False
             self.play_state = "play"
             self.playbar.update()
-            self.schedule_refresh()
 
         elif self.play_state == "stop":
             self.queue_panel.play_next()
@@ -325,7 +683,7 @@ class App(urwid.Pile):
                 self.queue_panel.clear()
             elif key in controls["g_queue_all"]:
                 self.queue_panel.add_songs_to_queue(
-                    self.search_panel.search_results.songs
+                    self.search_panel.search_results.visible("songs")
                 )
             elif self.focus != self.search_input:
                 if key in controls["seek_pos"]:
@@ -361,6 +719,8 @@ class App(urwid.Pile):
         if obj is None:
             return
 
+        self.cancel_search()  # its results would replace this view
+
         songs = []
         albums = []
         artists = []
@@ -370,21 +730,21 @@ class App(urwid.Pile):
         yt_vids = []
 
         if isinstance(obj, Song):
-            album_info = self.g_api.get_album_info(obj.albumId)
+            album_info = self.get_album_info(obj.albumId)
 
             songs = [Song.from_dict(track) for track in album_info["tracks"]]
             albums = [Album.from_dict(album_info)]
             artists = [Artist(obj.artist, obj.artistId)]
 
         elif isinstance(obj, Album):
-            album_info = self.g_api.get_album_info(obj.id)
+            album_info = self.get_album_info(obj.id)
 
             songs = [Song.from_dict(track) for track in album_info["tracks"]]
             albums = [obj]
             artists = [Artist(obj.artist, obj.artistId)]
 
         elif isinstance(obj, Artist):
-            artist_info = self.g_api.get_artist_info(obj.id)
+            artist_info = self.get_artist_info(obj.id)
 
             songs = [
                 Song.from_dict(track) for track in artist_info.get("topTracks", [])
@@ -406,6 +766,9 @@ class App(urwid.Pile):
             radio_stations = [obj]
 
         elif isinstance(obj, Playlist):
+            if obj.songs is None:
+                return self.load_playlist(obj, self.expand)
+
             songs = obj.songs
             playlists = [obj]
 
@@ -416,6 +779,71 @@ class App(urwid.Pile):
             songs, albums, artists, situations, radio_stations, playlists, yt_vids
         )
 
+    def load_playlist(self, playlist, then):
+        """Call ``then(playlist)`` once its songs are loaded.
+
+        Track lists are cached per playlist and fetched again only when the
+        playlist was modified since.
+        """
+        if playlist.songs is not None:
+            return then(playlist)
+
+        cached = self.playlists.get(playlist.id)
+        if cached is not None and cached["modified"] == playlist.modified:
+            playlist.songs = [decode(dct) for dct in cached["songs"]]
+            return then(playlist)
+
+        def fetch():
+            # Shared contents are only served with a share token, and
+            # gmusicapi fails on playlists without entries. The listing of
+            # all the user's playlists covers both.
+            if playlist.share_token:
+                try:
+                    return self.g_api.get_shared_playlist_contents(playlist.share_token)
+                except Exception as e:
+                    logging.exception(e)
+
+            try:
+                for contents in self.g_api.get_all_user_playlist_contents():
+                    if contents.get("id") == playlist.id:
+                        return contents.get("tracks", [])
+                return []
+            except Exception as e:
+                logging.exception(e)
+
+        def got(entries):
+            if entries is None:
+                self.search_panel.line_box.set_title(
+                    _("Could not load playlist {}").format(playlist.name)
+                )
+                return
+
+            songs = [
+                Song.from_dict(entry["track"]) for entry in entries if "track" in entry
+            ]
+            playlist.songs = [song for song in songs if song is not None]
+            self.playlists.put(
+                playlist.id,
+                dict(
+                    modified=playlist.modified,
+                    songs=[encode(song) for song in playlist.songs],
+                ),
+            )
+            self.search_panel.walker.changed()  # song counts
+            then(playlist)
+
+        self.worker.submit(fetch, callback=got)
+
+    def get_album_info(self, album_id):
+        return self.metadata.fetch(
+            "album:" + album_id, lambda: self.g_api.get_album_info(album_id)
+        )
+
+    def get_artist_info(self, artist_id):
+        return self.metadata.fetch(
+            "artist:" + artist_id, lambda: self.g_api.get_artist_info(artist_id)
+        )
+
     def youtube_search(
         self,
         q,
@@ -431,20 +859,23 @@ class App(urwid.Pile):
         if self.youtube is None:
             return None, []
 
-        search_response = (
-            self.youtube.search()
-            .list(
-                q=q,
-                type="video",
-                pageToken=token,
-                order=order,
-                part="id,snippet",
-                maxResults=max_results,
-                location=location,
-                locationRadius=location_radius,
+        # The discovery client shares one httplib2 connection, which is not
+        # thread safe.
+        with self.youtube_lock:
+            search_response = (
+                self.youtube.search()
+                .list(
+                    q=q,
+                    type="video",
+                    pageToken=token,
+                    order=order,
+                    part="id,snippet",
+                    maxResults=max_results,
+                    location=location,
+                    locationRadius=location_radius,
+                )
+                .execute()
             )
-            .execute()
-        )
 
         videos = []
         for search_result in search_response.get("items", []):
@@ -455,24 +886,194 @@ class App(urwid.Pile):
         nexttok = search_response.get("nextPageToken", None)
         return nexttok, videos
 
-    def search(self, query):
-        results = self.g_api.search(query)
+    def cancel_search(self):
+        # Calls already running can't be stopped, but their results are
+        # dropped when they land.
+        for future in self.search_futures:
+            future.cancel()
+
+        self.search_futures = []
+        self.search_generation += 1
+
+    def search(self, query, incremental=False):
+        # Both backends run on the worker pool. Incremental searches, run
+        # while typing, leave the focus and the back history alone.
+        self.cancel_search()
+        generation = self.search_generation
+        shown = []
+
+        # Library matches are shown at once. Until the store and YouTube
+        # answer, results of a shorter cached query stand in for theirs.
+        local = self.library.search(query) if self.library else ([], [], [])
+        parts = self.search_cache.get(query)
+        preview = self.search_cache.narrow(query)
+        store_size = [PAGE_SIZE]
+
+        def show():
+            # Late answers only update the results this search put up.
+            if generation != self.search_generation:
+                return
+            if shown and self.search_panel.search_results is not shown[0]:
+                return
+
+            store = parts.get("store", preview.get("store", ([], [], [])))
+            ytvids, _token = parts.get("youtube", preview.get("youtube", ([], None)))
+            categories = [merge(mine, theirs) for mine, theirs in zip(local, store)]
+            categories.append(ytvids)
+
+            pagers = {}
+            if "store" in parts:
+                pagers.update(songs=more_store, albums=more_store, artists=more_store)
+            if parts.get("youtube", (None, None))[1] is not None:
+                pagers["yt_vids"] = more_youtube
+
+            if shown:
+                self.search_panel.replace_search_results(*categories, pagers=pagers)
+                shown[0] = self.search_panel.search_results
+            else:
+                self.search_panel.update_search_results(
+                    *categories, provisional=incremental, pagers=pagers
+                )
+                shown.append(self.search_panel.search_results)
+                if not incremental:
+                    self.set_focus(self.search_panel_wrapped)
 
-        songs = [Song.from_dict(hit["track"]) for hit in results["song_hits"]]
-        albums = [Album.from_dict(hit["album"]) for hit in results["album_hits"]]
-        artists = [Artist.from_dict(hit["artist"]) for hit in results["artist_hits"]]
-        ytvids = [YTVideo.from_dict(hit) for hit in self.youtube_search(query)[1]]
+        def store_results(results):
+            songs = [Song.from_dict(hit["track"]) for hit in results["song_hits"]]
+            albums = [Album.from_dict(hit["album"]) for hit in results["album_hits"]]
+            artists = [
+                Artist.from_dict(hit["artist"]) for hit in results["artist_hits"]
+            ]
+            return songs, albums, artists
+
+        def show_store(results):
+            parts["store"] = store_results(results)
+            self.search_cache.put(query, "store", parts["store"])
+            show()
+
+        def show_youtube(results):
+            token, hits = results
+            parts["youtube"] = ([YTVideo.from_dict(hit) for hit in hits], token)
+            self.search_cache.put(query, "youtube", parts["youtube"])
+            show()
+
+        # The store has no paging tokens: a bigger search is made and the
+        # results not shown yet are added. YouTube continues from its token.
+        def more_store(done):
+            store_size[0] += PAGE_SIZE
+
+            def fetch():
+                try:
+                    return self.g_api.search(query, max_results=store_size[0])
+                except Exception as e:
+                    logging.exception(e)
+
+            def got(results):
+                if results is None:
+                    return done({})
+                # Kept with the query, so a later show() doesn't drop the page.
+                parts["store"] = store_results(results)
+                self.search_cache.put(query, "store", parts["store"])
+                songs, albums, artists = parts["store"]
+                done(dict(songs=songs, albums=albums, artists=artists))
+
+            self.worker.submit(fetch, callback=got)
+
+        def more_youtube(done):
+            def fetch():
+                try:
+                    return self.youtube_search(
+                        query, max_results=PAGE_SIZE, token=parts["youtube"][1]
+                    )
+                except Exception as e:
+                    logging.exception(e)
+
+            def got(results):
+                if results is None:
+                    return done({})
+                token, hits = results
+                page = [YTVideo.from_dict(hit) for hit in hits]
+                ytvids, _token = parts["youtube"]
+                parts["youtube"] = (ytvids + page, token)
+                self.search_cache.put(query, "youtube", parts["youtube"])
+                done({"yt_vids": page}, more=token is not None)
+
+            self.worker.submit(fetch, callback=got)
+
+        if parts or preview or any(local):
+            show()
+
+        if "store" not in parts:
+            self.search_futures.append(
+                self.worker.submit(
+                    self.g_api.search, query, max_results=PAGE_SIZE,
+                    callback=show_store,
+                )
+            )
 
-        self.search_panel.update_search_results(
-            songs, albums, artists, [], [], [], ytvids
-        )
-        self.set_focus(self.search_panel_wrapped)
+        if "youtube" not in parts:
+            self.search_futures.append(
+                self.worker.submit(
+                    self.youtube_search, query, max_results=PAGE_SIZE,
+                    callback=show_youtube,
+                )
+            )
 
     def listen_now(self):
-        situations = self.g_api.get_listen_now_situations()
-        items = self.g_api.get_listen_now_items()
-        playlists = self.g_api.get_all_user_playlist_contents()
-        liked = self.g_api.get_top_songs()
+        # The last home screen is shown at once and refreshed in the
+        # background, unless it is recent.
+        self.cancel_search()
+        data = self.listen_now_cache.get("listen_now")
+
+        if data is not None:
+            self.show_listen_now(data)
+        else:
+            self.listen_now_generation = self.search_generation
+
+        if time.time() - self.listen_now_fetched > LISTEN_NOW_FRESH:
+            self.refresh_listen_now()
+
+    def refresh_listen_now(self):
+        if self.listen_now_loading:
+            return
+
+        self.listen_now_loading = True
+        data = {}
+
+        def fetch(name):
+            try:
+                return getattr(self.g_api, name)()
+            except Exception as e:
+                logging.exception(e)
+
+        def got(name, value):
+            data[name] = value
+            if len(data) < len(LISTEN_NOW_CALLS):
+                return
+
+            # Parts that failed to load are taken from the last home screen.
+            previous = self.listen_now_cache.get("listen_now") or {}
+            for key, part in data.items():
+                if part is None:
+                    data[key] = previous.get(key, [])
+
+            self.listen_now_loading = False
+            self.listen_now_fetched = time.time()
+            self.listen_now_cache.put("listen_now", data)
+
+            if self.search_panel.search_results is self.listen_now_results:
+                self.show_listen_now(data, replace=True)
+            elif self.listen_now_generation == self.search_generation:
+                self.show_listen_now(data)
+
+        for name in LISTEN_NOW_CALLS:
+            self.worker.submit(fetch, name, callback=partial(got, name))
+
+    def show_listen_now(self, data, replace=False):
+        situations = data.get("get_listen_now_situations", [])
+        items = data.get("get_listen_now_items", [])
+        playlists = data.get("get_all_playlists", [])
+        liked = data.get("get_top_songs", [])
 
         situations = [Situation.from_dict(hit) for hit in situations]
         albums = [Album.from_dict(hit["album"]) for hit in items if "album" in hit]
@@ -486,29 +1087,96 @@ class App(urwid.Pile):
         liked = [Song.from_dict(song) for song in liked]
         playlists.append(Playlist(_("Liked"), liked, None))
 
-        self.search_panel.update_search_results(
-            [], albums, [], situations, radio_stations, playlists, []
-        )
-        self.set_focus(self.search_panel_wrapped)
+        categories = [], albums, [], situations, radio_stations, playlists, []
+
+        self.listen_now_generation = None
+        if replace:
+            self.search_panel.replace_search_results(*categories)
+        else:
+            self.search_panel.update_search_results(*categories)
+            self.set_focus(self.search_panel_wrapped)
+
+        self.listen_now_results = self.search_panel.search_results
 
     def create_radio_station(self, obj):
         if isinstance(obj, Song):
-            station_id = self.g_api.create_station(obj.title, track_id=obj.id)
+            def create():
+                return self.g_api.create_station(obj.title, track_id=obj.id)
         elif isinstance(obj, Album):
-            station_id = self.g_api.create_station(obj.title, album_id=obj.id)
+            def create():
+                return self.g_api.create_station(obj.title, album_id=obj.id)
         elif isinstance(obj, Artist):
-            station_id = self.g_api.create_station(obj.name, artist_id=obj.id)
+            def create():
+                return self.g_api.create_station(obj.name, artist_id=obj.id)
         elif isinstance(obj, RadioStation):
-            station_id = obj.get_station_id(self.g_api)
+            def create():
+                return obj.get_station_id(self.g_api)
         else:
             return
 
-        for song in self.get_radio_songs(station_id):
-            self.queue_panel.add_song_to_queue(song)
+        self.start_radio(create)
+
+    def start_radio(self, create, to_front=False):
+        # Creating the station and fetching its first songs happen on the
+        # worker. In endless mode the station is then refilled as the queue
+        # runs low.
+        recent = self.recently_played.recent(RADIO_RECENT)
+
+        def fetch():
+            station_id = create()
+            return station_id, self.get_radio_songs(station_id, recent=recent)
+
+        def got(result):
+            station_id, songs = result
+            self.radio_station = station_id if self.endless_radio else None
+
+            if to_front:
+                songs = reversed(songs)
+
+            for song in songs:
+                self.queue_panel.add_song_to_queue(song, to_front)
+
+        self.worker.submit(fetch, callback=got)
+
+    def refill_radio(self):
+        queue = self.queue_panel.queue
+        if (
+            self.radio_station is None
+            or self.radio_loading
+            or len(queue) >= self.radio_low_water
+        ):
+            return
+
+        self.radio_loading = True
+        station_id = self.radio_station
+        recent = self.recently_played.recent(RADIO_RECENT)
 
-    def get_radio_songs(self, station_id, n=50):
-        song_dicts = self.g_api.get_station_tracks(station_id, num_tracks=n)
-        return [Song.from_dict(song_dict) for song_dict in song_dicts]
+        def fetch():
+            try:
+                return self.get_radio_songs(station_id, RADIO_BATCH, recent)
+            except Exception as e:
+                logging.exception(e)
+                return []
+
+        def got(songs):
+            if self.radio_station == station_id:  # not changed or stopped since
+                queued = {song.id for song in self.queue_panel.queue}
+                for song in songs:
+                    if song.id not in self.recently_played and song.id not in queued:
+                        queued.add(song.id)
+                        self.queue_panel.add_song_to_queue(song)
+
+            # only now, as adding to the queue checks the water mark again
+            self.radio_loading = False
+
+        self.worker.submit(fetch, callback=got)
+
+    def get_radio_songs(self, station_id, n=50, recent=None):
+        song_dicts = self.g_api.get_station_tracks(
+            station_id, num_tracks=n, recently_played_ids=recent
+        )
+        songs = [Song.from_dict(song_dict) for song_dict in song_dicts]
+        return [song for song in songs if song is not None]
 
     def rate_current_song(self, rating):
         if type(self.current_song) != Song:
@@ -529,42 +1197,50 @@ class App(urwid.Pile):
 
         self.g_api.rate_songs(track, rating)
         self.playbar.update()
-        self.loop.draw_screen()
 
     def cleanup(self, *args, **kwargs):
+        self.worker.shutdown()
+
+        if self.lastfm and self.lastfm.scrobbler:
+            self.lastfm.scrobbler.stop()
+
         self.player.quit()
         del self.player
 
         self.g_api.logout()
         self.loop.stop()
 
-        if self.persist_queue:
-            self.save_queue()
-
+        self.queue_journal.close()
         self.save_history()
-        sys.exit()
-
-    def save_queue(self):
-        print(_("saving queue"))
-        queue = []
-
-        if self.current_song is not None:
-            queue.append(self.current_song)
 
-        queue.extend(self.queue_panel.queue)
+        self.metadata.save()
+        logging.info("metadata cache: %s", self.metadata.stats())
+        self.search_cache.save()
+        self.listen_now_cache.save()
+        self.playlists.save()
 
-        with open(QUEUE_FILE, "w") as f:
-            f.write(serialize(queue))
+        net.close()
+        logging.info("frames: %s", self.loop.stats())
+        sys.exit()
 
     def restore_queue(self):
         try:
-            with open(QUEUE_FILE, "r") as f:
-                self.queue_panel.add_songs_to_queue(deserialize(f.read()))
-
-        except (AttributeError, FileNotFoundError) as e:
+            current, queue = self.queue_journal.restore()
+        except (AttributeError, ValueError) as e:
             logging.exception(e)
             print(_("failed to restore queue. :("))
-            self.queue_panel.clear()
+            current, queue = None, []
+
+        self.queue_journal.open()
+
+        # The song that was playing goes back to the front of the queue.
+        if current is not None:
+            queue.insert(0, current)
+            self.queue_journal.current(None)
+            self.queue_journal.add(0, current)
+
+        self.queue_panel.add_songs_to_queue(queue)
+        self.queue_panel.journal = self.queue_journal
 
     def save_history(self):
         if self.current_song:
@@ -577,6 +1253,10 @@ class App(urwid.Pile):
         try:
             with open(HISTORY_FILE, "r") as f:
                 self.history = deserialize(f.read())
+
+            for song in reversed(self.history):
+                if isinstance(song, Song):
+                    self.recently_played.add(song.id)
         except (AttributeError, FileNotFoundError) as e:
             logging.exception(e)
             print(_("failed to restore recently played. :("))
@@ -609,14 +1289,18 @@ def main():
     parser.add_argument(
         "action", choices=["", "configure_last_fm"], default="", nargs="?"
     )
-    parser.add_argument("-v", "--verbose", action="store_true")  # TODO: use this
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=_("log more and report how long startup took"),
+    )
     args = parser.parse_args()
 
     print(_("starting up."))
     makedirs(CONFIG_DIR, exist_ok=True)
 
     log_file = join(CONFIG_DIR, "log.txt")
-    logging.basicConfig(filename=log_file, filemode="w", level=logging.WARNING)
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    logging.basicConfig(filename=log_file, filemode="w", level=log_level)
 
     if args.action == "configure_last_fm":
         LastFMAPI.configure()
@@ -625,7 +1309,11 @@ def main():
         print(f"Unrecognized option: {args.action}")
         exit(0)
 
+    startup_start = perf_counter()
     app = App()
+    app.startup.add("imports", IMPORT_TIME)
+    app.startup.add("player", perf_counter() - startup_start)
+
     print(_("logging in."))
     app.login()
 
@@ -633,30 +1321,50 @@ def main():
         from .mpris import setup_mpris
 
         print(_("enabling external control."))
-        app.mpris = setup_mpris(app)
+        with app.startup.phase("mpris"):
+            app.mpris = setup_mpris(app)
         if not app.mpris:
             print(_("Failed."))
 
-    if app.persist_queue:
-        print(_("restoring queue"))
-        app.restore_queue()
+    with app.startup.phase("restore"):
+        if app.persist_queue:
+            print(_("restoring queue"))
+            app.restore_queue()
 
-    print(_("restoring history"))
-    app.restore_history()
+        print(_("restoring history"))
+        app.restore_history()
 
     if app.video:
         app.player["vid"] = "auto"
 
+    if app.gapless:
+        app.player["gapless-audio"] = "yes"
+        app.player["prefetch-playlist"] = "yes"
+
+    report = app.startup.report()
+    logging.info("startup times:\n" + report)
+
+    if app.startup.total() > app.startup_budget:
+        logging.warning(
+            f"startup took {app.startup.total():.2f}s, "
+            f"over the budget of {app.startup_budget:.2f}s"
+        )
+
+    if args.verbose:
+        print(_("startup times:"))
+        print(report)
+
     import signal
 
     signal.signal(signal.SIGINT, app.cleanup)
 
-    loop = urwid.MainLoop(app, event_loop=urwid.GLibEventLoop())
+    loop = FrameLoop(app, event_loop=urwid.GLibEventLoop(), fps=app.max_fps)
     loop.screen.set_terminal_properties(256)
     loop.screen.register_palette(
         [(k.replace("-", " "), "", "", "", fg, bg) for k, (fg, bg) in palette.items()]
     )
     app.loop = loop
+    app.worker.attach(loop)
 
     try:
         loop.run()
@@ -0,0 +1,90 @@
+import hashlib
+import logging
+import os
+
+from tuijam import net
+from tuijam.cache import DirectoryCache, write_atomic
+
+
+def art_url(obj):
+    """Remote URL of the album art of a song or the thumbnail of a video."""
+    return getattr(obj, "albumArtRef", None) or getattr(obj, "thumbnail", None)
+
+
+class ArtCache(DirectoryCache):
+    """Images downloaded to ``directory``, for MPRIS clients to read locally."""
+
+    def __init__(self, directory, worker, max_bytes=50 * 1024 * 1024):
+        super().__init__(directory, max_bytes, suffix=".jpg")
+        self.worker = worker
+        self.fetching = {}  # key -> callbacks waiting for the download
+
+    def uri(self, url):
+        """``file://`` URI of the cached copy of ``url``, or None."""
+        if not url or self.max_bytes <= 0:
+            return None
+
+        path = self.touch(self._key(url))
+        return "file://" + path if path is not None else None
+
+    def fetch(self, url, callback=None):
+        """Download ``url`` in the background unless it is cached.
+
+        ``callback(uri)`` is called on the UI thread once it is stored.
+        """
+        if not url or self.max_bytes <= 0:
+            return
+
+        key = self._key(url)
+
+        with self.lock:
+            if key in self:
+                return
+
+            # A download already running calls back every caller when done.
+            downloading = key in self.fetching
+            callbacks = self.fetching.setdefault(key, [])
+            if callback is not None:
+                callbacks.append(callback)
+            if downloading:
+                return
+
+        self.worker.submit(self._download, url, key, callback=self._done)
+
+    def prefetch(self, urls):
+        for url in urls:
+            self.fetch(url)
+
+    def _download(self, url, key):
+        path = self.path(key)
+
+        try:
+            response = net.get(url)
+            response.raise_for_status()
+            data = response.content
+
+            os.makedirs(self.directory, exist_ok=True)
+            write_atomic(path, data)
+        except Exception as e:
+            logging.exception(e)
+            with self.lock:
+                del self.fetching[key]
+            return None
+
+        self.add(key, len(data))
+        return key, "file://" + path
+
+    def _done(self, result):
+        if result is None:
+            return
+
+        key, uri = result
+        with self.lock:
+            callbacks = self.fetching.pop(key)
+
+        for callback in callbacks:
+            callback(uri)
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(url.encode()).hexdigest()
@@ -0,0 +1,94 @@
+import logging
+import os
+import shutil
+from os.path import join
+
+from tuijam.cache import DirectoryCache, remove_file
+
+SUFFIX = ".mp3"  # mpv picks the container of a recording from its extension
+
+
+class AudioCache(DirectoryCache):
+    """Audio of played songs, stored in ``directory`` under their song ids.
+
+    mpv records a song's stream to a partial file while playing it. The
+    recording is kept only if the song played to its end without seeking,
+    so a cached file always holds the whole song. A budget of 0 disables the
+    cache.
+
+    Only used from the UI thread.
+    """
+
+    def __init__(self, directory, max_bytes=0):
+        super().__init__(directory, max_bytes, suffix=SUFFIX)
+        self.partial_dir = join(directory, "partial")
+        self.recording = {}  # song id -> whether its recording is still whole
+        self.cleared = False
+
+    def get(self, song_id):
+        """Path of the cached audio of ``song_id``, or None."""
+        if self.max_bytes <= 0:
+            return None
+
+        return self.touch(song_id)
+
+    def record(self, song_id):
+        """Path mpv should record the stream of ``song_id`` to, or None."""
+        if self.max_bytes <= 0:
+            return None
+
+        if not self.cleared:
+            # left over from a session that ended mid-song
+            shutil.rmtree(self.partial_dir, ignore_errors=True)
+            self.cleared = True
+
+        try:
+            os.makedirs(self.partial_dir, exist_ok=True)
+        except OSError as e:
+            logging.exception(e)
+            return None
+
+        self.recording[song_id] = True
+        return self._partial(song_id)
+
+    def interrupt(self, song_id):
+        """The recording of ``song_id`` has a gap, e.g. after a seek."""
+        if song_id in self.recording:
+            self.recording[song_id] = False
+
+    def finish(self, song_id):
+        """``song_id`` played to its end; keep its recording if it is whole."""
+        whole = self.recording.pop(song_id, None)
+        if whole is None:
+            return
+
+        partial = self._partial(song_id)
+
+        if whole:
+            try:
+                size = os.path.getsize(partial)
+                if size:
+                    os.replace(partial, self.path(song_id))
+                    self.add(song_id, size)
+                    return
+            except OSError as e:
+                logging.exception(e)
+
+        remove_file(partial)
+
+    def abandon(self, keep=None):
+        """Drop every recording in progress except the one of ``keep``."""
+        for song_id in list(self.recording):
+            if song_id != keep:
+                del self.recording[song_id]
+                remove_file(self._partial(song_id))
+
+    def discard(self, song_id):
+        """Forget ``song_id``, e.g. because its cached file would not play."""
+        if self.recording.pop(song_id, None) is not None:
+            remove_file(self._partial(song_id))
+
+        self.remove(song_id)
+
+    def _partial(self, song_id):
+        return join(self.partial_dir, song_id + SUFFIX)
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from os.path import join
+
+
+def write_temp(path, data, mode=0o666):
+    """Write ``data``, text or bytes, next to ``path`` and return where."""
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+    return tmp_path
+
+
+def write_atomic(path, data, mode=0o666):
+    """Replace ``path`` with ``data`` so that readers never see a partial file."""
+    os.replace(write_temp(path, data, mode), path)
+
+
+class PersistentCache:
+    """Size bounded LRU mapping whose entries expire after ``ttl`` seconds.
+
+    Values must be JSON serializable. The cache is read from ``path`` on first
+    use and written back by ``save``, least recently used entries first.
+    """
+
+    def __init__(self, path, max_entries=200, ttl=24 * 60 * 60):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (timestamp, value)
+        self.hits = 0
+        self.misses = 0
+        self.loaded = False
+        self.dirty = False
+        self.lock = threading.RLock()
+
+    def get(self, key):
+        with self.lock:
+            self._load()
+            try:
+                stamp, value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            if time.time() - stamp > self.ttl:
+                del self.entries[key]
+                self.dirty = True
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self._load()
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+            self.dirty = True
+
+    def fetch(self, key, loader):
+        value = self.get(key)
+
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+
+        return value
+
+    def invalidate(self, key):
+        with self.lock:
+            self._load()
+            if self.entries.pop(key, None) is not None:
+                self.dirty = True
+
+    def stats(self):
+        return dict(entries=len(self.entries), hits=self.hits, misses=self.misses)
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+
+            data = [[key, stamp, value] for key, (stamp, value) in self.entries.items()]
+
+            try:
+                write_atomic(self.path, json.dumps(data))
+                self.dirty = False
+            except OSError as e:
+                logging.exception(e)
+
+    def _load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.exception(e)
+            return
+
+        now = time.time()
+        for key, stamp, value in data[-self.max_entries:]:
+            if now - stamp <= self.ttl:
+                self.entries[key] = (stamp, value)
+
+
+class DirectoryCache:
+    """Files in ``directory``, named by key, that take at most ``max_bytes``.
+
+    Once the files take more, the least recently used are deleted. Recency
+    is kept in the files' modification times, so it carries over between
+    sessions. Subclasses write a file to ``path(key)`` and then ``add`` it.
+    """
+
+    def __init__(self, directory, max_bytes, suffix=""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.files = None  # key -> size, least recently used first
+        self.size = 0
+        self.lock = threading.RLock()
+
+    def path(self, key):
+        return join(self.directory, key + self.suffix)
+
+    def __contains__(self, key):
+        with self.lock:
+            self._scan()
+            return key in self.files
+
+    def touch(self, key):
+        """Path of the file of ``key``, now the most recently used, or None."""
+        with self.lock:
+            self._scan()
+            if key not in self.files:
+                return None
+
+            path = self.path(key)
+            try:
+                os.utime(path)
+            except OSError:  # deleted behind our back
+                self.size -= self.files.pop(key)
+                return None
+
+            self.files.move_to_end(key)
+            return path
+
+    def add(self, key, size):
+        """Account for a file of ``size`` bytes just written to ``path(key)``."""
+        with self.lock:
+            self._scan()
+            self.size += size - self.files.pop(key, 0)
+            self.files[key] = size
+            self._evict()
+
+    def remove(self, key):
+        with self.lock:
+            self._scan()
+            if key in self.files:
+                self.size -= self.files.pop(key)
+                remove_file(self.path(key))
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self.files) > 1:
+            key, size = self.files.popitem(last=False)
+            self.size -= size
+            remove_file(self.path(key))
+
+    def _scan(self):
+        if self.files is not None:
+            return
+
+        self.files = OrderedDict()
+
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith(self.suffix) and entry.is_file()
+            ]
+        except FileNotFoundError:
+            return
+
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            size = entry.stat().st_size
+            self.files[entry.name[: len(entry.name) - len(self.suffix)]] = size
+            self.size += size
+
+        self._evict()
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import random
+
+from .cache import write_temp
+from .music_objects import encode, decode, serialize, deserialize
+from .play_queue import PlayQueue
+
+
+class QueueJournal:
+    """Append-only log of queue mutations on top of a queue snapshot.
+
+    The snapshot is a queue file as written by ``serialize``. Each mutation
+    made since is appended to the journal as one JSON line, so persisting a
+    change costs a single small write. The first line of the journal
+    identifies the snapshot it applies to; a journal left over from an older
+    snapshot is ignored. ``compact`` folds the journal into a new snapshot.
+    """
+
+    def __init__(self, snapshot_path, journal_path, compact_after=1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_after = compact_after
+        self.file = None
+        self.entries = 0
+        self.pending = None  # entries recorded while a compaction is running
+        self.valid = False  # whether the journal on disk matches the snapshot
+        self.torn = False  # whether the journal ends in an incomplete line
+
+    def restore(self):
+        """Return the current song and queue as of the last recorded change."""
+        try:
+            with open(self.snapshot_path) as f:
+                queue = PlayQueue(deserialize(f.read()))
+        except FileNotFoundError:
+            queue = PlayQueue()
+
+        current = None
+        content = ""
+
+        try:
+            with open(self.journal_path) as f:
+                content = f.read()
+        except FileNotFoundError:
+            pass
+
+        lines = content.splitlines()
+        self.torn = not content.endswith("\n")
+
+        self.valid = bool(lines) and self._parse(lines[0]) == self._header()
+
+        if self.valid:
+            self.entries = len(lines) - 1
+            for line in lines[1:]:
+                entry = self._parse(line)
+                if entry is None:  # torn write at the end of the journal
+                    break
+
+                op, *args = entry
+                try:
+                    current = self._replay(queue, current, op, args)
+                except (IndexError, KeyError, TypeError, ValueError) as e:
+                    logging.exception(e)
+                    break
+
+        return current, list(queue)
+
+    def open(self):
+        """Continue recording after ``restore``."""
+        if self.valid:
+            self.file = open(self.journal_path, "a", buffering=1)
+            if self.torn:
+                self.file.write("\n")
+        else:
+            self._start(self.journal_path, self._header(), None, [])
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def add(self, idx, obj):
+        self._record("add", idx, encode(obj))
+
+    def remove(self, idx):
+        self._record("remove", idx)
+
+    def swap(self, idx1, idx2):
+        self._record("swap", idx1, idx2)
+
+    def move(self, src, dst):
+        self._record("move", src, dst)
+
+    def shuffle(self, seed):
+        self._record("shuffle", seed)
+
+    def pop(self):
+        self._record("pop")
+
+    def clear(self):
+        self._record("clear")
+
+    def current(self, obj):
+        self._record("current", None if obj is None else encode(obj))
+
+    def needs_compaction(self, queue_len):
+        return self.pending is None and self.entries > max(
+            self.compact_after, queue_len
+        )
+
+    def compact(self, worker, current, queue):
+        # The snapshot is written on the worker; entries recorded meanwhile
+        # are kept and carried over into the new journal.
+        self.pending = []
+        items = list(queue)
+
+        # Both files are replaced together once the new journal is started.
+        def write_snapshot():
+            try:
+                tmp_path = write_temp(self.snapshot_path, serialize(items))
+                return tmp_path, self._header(tmp_path)
+            except OSError as e:
+                logging.exception(e)
+
+        def done(written):
+            pending, self.pending = self.pending, None
+            if written is None:
+                return
+
+            tmp_path, header = written
+            journal_tmp = self.journal_path + ".tmp"
+            self._start(journal_tmp, header, current, pending)
+            os.replace(tmp_path, self.snapshot_path)
+            os.replace(journal_tmp, self.journal_path)
+
+        worker.submit_long(write_snapshot, callback=done)
+
+    def _start(self, path, header, current, entries):
+        self.close()
+        self.file = open(path, "w", buffering=1)
+        self.file.write(json.dumps(header) + "\n")
+        self.entries = 0
+
+        if current is not None:
+            self.current(current)
+
+        for line in entries:
+            self.file.write(line)
+            self.entries += 1
+
+    def _record(self, op, *args):
+        if self.file is None:
+            return
+
+        line = json.dumps([op, *args]) + "\n"
+
+        try:
+            self.file.write(line)
+        except OSError as e:
+            logging.exception(e)
+
+        self.entries += 1
+
+        if self.pending is not None:
+            self.pending.append(line)
+
+    def _header(self, path=None):
+        try:
+            st = os.stat(path or self.snapshot_path)
+            return ["snapshot", st.st_size, st.st_mtime_ns]
+        except FileNotFoundError:
+            return ["snapshot", None, None]
+
+    @staticmethod
+    def _parse(line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _replay(queue, current, op, args):
+        if op == "add":
+            idx, obj = args
+            queue.insert(idx, decode(obj))
+        elif op == "remove":
+            queue.pop(args[0])
+        elif op == "swap":
+            queue.swap(*args)
+        elif op == "move":
+            queue.move(*args)
+        elif op == "shuffle":
+            queue.shuffle(random.Random(args[0]))
+        elif op == "pop":
+            current = queue.popleft()
+        elif op == "clear":
+            queue.clear()
+        elif op == "current":
+            current = None if args[0] is None else decode(args[0])
+
+        return current
@@ -1,13 +1,24 @@
 import hashlib
+import json
 import logging
+import threading
+import time
 from datetime import datetime
 
-import requests
-import yaml
-
-from tuijam import __version__, CONFIG_DIR, _
+from tuijam import __version__, CONFIG_DIR, _, net
+from tuijam.cache import write_atomic
 from tuijam.utility import lookup_keys
 
+# track.scrobble accepts at most 50 tracks per call.
+SCROBBLE_BATCH_SIZE = 50
+# Error codes after which a scrobble is worth retrying: service offline,
+# temporarily unavailable and rate limit exceeded.
+RETRY_ERRORS = (11, 16, 29)
+# The session key was revoked; nothing goes through until it is renewed.
+INVALID_SESSION = 9
+RETRY_BASE = 30
+RETRY_MAX = 60 * 60
+
 
 class LastFMAPI:
     API_KEY = None
@@ -18,6 +29,7 @@ class LastFMAPI:
     def __init__(self, sk=None):
         # Initialize session key with None
         self.sk = sk
+        self.scrobbler = None
 
         if LastFMAPI.API_KEY is None or LastFMAPI.API_SECRET is None:
             LastFMAPI.API_KEY, LastFMAPI.API_SECRET = lookup_keys(
@@ -46,13 +58,16 @@ class LastFMAPI:
         # Shame on you, Last.fm!
         api_params.update({"format": "json"})
 
-        r = requests.post(
+        r = net.post(
             LastFMAPI.API_ROOT_URL,
             params=api_params,
             headers={"User-Agent": LastFMAPI.USER_AGENT},
         )
         return r.json()
 
+    def start_scrobbler(self, path):
+        self.scrobbler = Scrobbler(self, path)
+
     def get_token(self):
         token_response = self.call_method("auth.getToken")
         if not token_response.get("error"):
@@ -93,50 +108,58 @@ class LastFMAPI:
 
     def update_now_playing_song(self, song):
         try:
-            self.update_now_playing(
-                song.artist,
-                song.title,
-                song.album,
-                song.length[1] * 60 + song.length[0],
-            )
             song.lastfm_ts_start = int(datetime.now().timestamp())
             # ^ there could be a bug when tracks are scrobbled in the past or the future
             #   (depends on timezone)
+            args = (song.artist, song.title, song.album, song.duration)
+
+            if self.scrobbler is not None:
+                self.scrobbler.update_now_playing(*args)
+            else:
+                self.update_now_playing(*args)
         except Exception as e:
             logging.exception("LASTFM: updateNowPlaying: " + e.__str__())
             logging.error("LASTFM: updateNowPlaying: failed to update")
 
     def scrobble(self, artist, track, album, duration, ts_start):
+        return self.scrobble_tracks(
+            [dict(artist=artist, track=track, album=album, duration=duration,
+                  timestamp=ts_start)]
+        )
+
+    def scrobble_tracks(self, tracks):
         # See the scrobble method reference (https://www.last.fm/api/show/track.scrobble)
         if self.sk is None:
-            return False
+            return None
 
-        response = self.call_method(
-            "track.scrobble",
-            {
-                "timestamp[0]": str(ts_start),
-                "artist[0]": artist,
-                "track[0]": track,
-                "album[0]": album,
-                "duration[0]": duration,
-                "sk": self.sk,
-            },
-        )
+        params = {"sk": self.sk}
+        for i, track in enumerate(tracks[:SCROBBLE_BATCH_SIZE]):
+            params[f"timestamp[{i}]"] = str(track["timestamp"])
+            params[f"artist[{i}]"] = track["artist"]
+            params[f"track[{i}]"] = track["track"]
+            params[f"album[{i}]"] = track["album"]
+            params[f"duration[{i}]"] = track["duration"]
+
+        response = self.call_method("track.scrobble", params)
         logging.warning("LASTFM: scrobble: response = " + response.__str__())
+        return response
 
     def scrobble_song(self, song, progress):
         # See: https://www.last.fm/api/scrobbling#when-is-a-scrobble-a-scrobble
         # Minimum 30 seconds long + has been listened for min(50% of its length or 4 minutes)
         try:
-            length = song.length[0] * 60 + song.length[1]
+            length = song.duration
             if (
                 not song.lastfm_scrobbled
                 and length >= 30
                 and (progress / length > 0.5 or progress > 4 * 60)
             ):
-                self.scrobble(
-                    song.artist, song.title, song.album, length, song.lastfm_ts_start
-                )
+                args = (song.artist, song.title, song.album, length, song.lastfm_ts_start)
+
+                if self.scrobbler is not None:
+                    self.scrobbler.scrobble(*args)
+                else:
+                    self.scrobble(*args)
                 song.lastfm_scrobbled = True
         except Exception as e:
             logging.exception("LASTFM: scrobble: " + e.__str__())
@@ -146,6 +169,7 @@ class LastFMAPI:
     def configure():
         from os.path import join, isfile
         from getpass import getpass
+        import yaml
 
         config_file = join(CONFIG_DIR, "config.yaml")
         if not isfile(config_file):
@@ -182,3 +206,124 @@ class LastFMAPI:
                 f.truncate()
                 f.close()
             print(_("Successfully authenticated."))
+
+
+class Scrobbler:
+    """Talks to Last.fm from a background thread.
+
+    Scrobbles are queued in a file, so that they survive restarts and network
+    outages, and submitted in batches. Failed submissions are retried with
+    exponential backoff. Now-playing updates are sent as they come and never
+    retried.
+    """
+
+    def __init__(self, api, path):
+        self.api = api
+        self.path = path
+        self.pending = self._load()
+        self.now_playing = None
+        self.failures = 0
+        self.retry_at = 0
+        self.stopped = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(
+            target=self._run, name="tuijam-scrobbler", daemon=True
+        )
+        self.thread.start()
+
+    def scrobble(self, artist, track, album, duration, timestamp):
+        with self.cond:
+            if self.stopped:
+                return
+
+            self.pending.append(
+                dict(artist=artist, track=track, album=album, duration=duration,
+                     timestamp=timestamp)
+            )
+            self._save()
+            self.cond.notify()
+
+    def update_now_playing(self, artist, track, album, duration):
+        with self.cond:
+            self.now_playing = (artist, track, album, duration)
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+
+    def _ready(self):
+        return self.pending and time.time() >= self.retry_at
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not (self.stopped or self.now_playing or self._ready()):
+                    timeout = self.retry_at - time.time() if self.pending else None
+                    self.cond.wait(timeout)
+
+                if self.stopped:
+                    return
+
+                now_playing, self.now_playing = self.now_playing, None
+                batch = self.pending[:SCROBBLE_BATCH_SIZE] if self._ready() else []
+
+            if now_playing:
+                try:
+                    self.api.update_now_playing(*now_playing)
+                except Exception as e:
+                    logging.exception("LASTFM: updateNowPlaying: " + e.__str__())
+
+            if batch:
+                self._submit(batch)
+
+    def _submit(self, batch):
+        try:
+            response = self.api.scrobble_tracks(batch)
+            error = response.get("error") if response is not None else 9
+        except Exception as e:
+            logging.exception("LASTFM: scrobble: " + e.__str__())
+            error = 11
+
+        with self.cond:
+            if error == INVALID_SESSION:
+                # Keep what is queued for the next session, but stop adding
+                # to a queue that cannot be submitted.
+                self.stopped = True
+                logging.error(
+                    f"LASTFM: scrobble: session key rejected, keeping {len(self.pending)}"
+                    " scrobbles until Last.fm is configured again (tuijam configure_last_fm)"
+                )
+                return
+
+            if error in RETRY_ERRORS:
+                self.failures += 1
+                delay = min(RETRY_MAX, RETRY_BASE * 2 ** (self.failures - 1))
+                self.retry_at = time.time() + delay
+                logging.warning(f"LASTFM: scrobble: retrying in {delay}s")
+                return
+
+            if error:
+                logging.error(f"LASTFM: scrobble: dropping {len(batch)} scrobbles")
+
+            del self.pending[: len(batch)]
+            self.failures = 0
+            self.retry_at = 0
+            self._save()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logging.exception(e)
+            return []
+
+    def _save(self):
+        try:
+            write_atomic(self.path, json.dumps(self.pending))
+        except OSError as e:
+            logging.exception(e)
@@ -0,0 +1,304 @@
+import json
+import logging
+import re
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict
+
+from .cache import write_atomic
+from .music_objects import Song, Album, Artist, encode, decode
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    # Case and accent insensitive: "Beyoncé" is found by "beyonce".
+    text = unicodedata.normalize("NFKD", str(text or "")).casefold()
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return TOKEN_RE.findall(text)
+
+
+def trigrams(token):
+    return {token[i : i + 3] for i in range(len(token) - 2)}
+
+
+def identity(obj):
+    # Library and store copies of a song have different ids.
+    if isinstance(obj, Song):
+        return obj.title.casefold(), obj.artist.casefold(), obj.album.casefold()
+    return obj.id
+
+
+def matches(obj, terms):
+    """Whether every term is a prefix of a word of ``obj``'s name."""
+    fields = ("title", "name", "artist", "album", "channel")
+    tokens = tokenize(" ".join(str(getattr(obj, field, "")) for field in fields))
+    return all(any(token.startswith(term) for token in tokens) for term in terms)
+
+
+def merge(local, remote):
+    """``local`` followed by the items of ``remote`` that are not in it."""
+    seen = {identity(obj) for obj in local}
+    return list(local) + [
+        obj for obj in remote if obj is not None and identity(obj) not in seen
+    ]
+
+
+class LibraryIndex:
+    """Full text index over the songs of the user's library and playlists.
+
+    Every word of a song's title, artist and album is a token. A query word
+    matches the tokens it is a prefix of, found by bisecting the sorted
+    vocabulary, or failing that the tokens containing it, found through their
+    trigrams. A song matches a query if it matches every word.
+    """
+
+    FIELDS = ("title", "artist", "album")
+
+    def __init__(self, songs=(), built=0):
+        self.songs = list(songs)
+        self.built = built
+        self.postings = {}  # token -> ids of the songs containing it
+        self.trigrams = {}  # trigram -> tokens containing it
+
+        for doc, song in enumerate(self.songs):
+            for field in self.FIELDS:
+                for token in tokenize(getattr(song, field)):
+                    self.postings.setdefault(token, set()).add(doc)
+
+        self.vocab = sorted(self.postings)
+        for token in self.vocab:
+            for gram in trigrams(token):
+                self.trigrams.setdefault(gram, []).append(token)
+
+    def __len__(self):
+        return len(self.songs)
+
+    def stale(self, ttl):
+        return time.time() - self.built > ttl
+
+    def search(self, query, limit=30):
+        """Return the matching songs and their albums and artists."""
+        scores = None
+
+        for term in tokenize(query):
+            docs, exact = self._matches(term)
+
+            if scores is None:
+                scores = dict.fromkeys(docs, 0)
+            else:
+                scores = {doc: score for doc, score in scores.items() if doc in docs}
+
+            for doc in scores:
+                scores[doc] += 2 if doc in exact else 1
+
+            if not scores:
+                break
+
+        if not scores:
+            return [], [], []
+
+        ranked = sorted(scores, key=lambda doc: (-scores[doc], doc))
+        songs = [self.songs[doc] for doc in ranked[:limit]]
+
+        albums = {}
+        artists = {}
+        for doc in ranked:
+            song = self.songs[doc]
+            if song.albumId not in albums and len(albums) < limit:
+                albums[song.albumId] = Album(
+                    song.album, song.artist, song.artistId, "", song.albumId
+                )
+            if song.artistId not in artists and len(artists) < limit:
+                artists[song.artistId] = Artist(song.artist, song.artistId)
+            if len(albums) == len(artists) == limit:
+                break
+
+        return songs, list(albums.values()), list(artists.values())
+
+    def _matches(self, term):
+        exact = self.postings.get(term, ())
+        docs = set()
+
+        i = bisect_left(self.vocab, term)
+        while i < len(self.vocab) and self.vocab[i].startswith(term):
+            docs.update(self.postings[self.vocab[i]])
+            i += 1
+
+        if not docs and len(term) >= 3:
+            tokens = None
+            for gram in trigrams(term):
+                found = set(self.trigrams.get(gram, ()))
+                tokens = found if tokens is None else tokens & found
+
+            for token in tokens:
+                if term in token:
+                    docs.update(self.postings[token])
+
+        return docs, exact
+
+    @classmethod
+    def build(cls, g_api):
+        songs = [Song.from_dict(d) for d in g_api.get_all_songs()]
+        songs = [song for song in songs if song is not None]
+        known = {song.id for song in songs}
+
+        # Playlist entries only carry track details for store tracks; library
+        # tracks are covered above.
+        for playlist in g_api.get_all_user_playlist_contents():
+            for entry in playlist.get("tracks", []):
+                if "track" not in entry:
+                    continue
+
+                song = Song.from_dict(entry["track"])
+                if song is not None and song.id not in known:
+                    known.add(song.id)
+                    songs.append(song)
+
+        return cls(songs, time.time())
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.exception(e)
+            return None
+
+        return cls([decode(dct) for dct in data["songs"]], data["built"])
+
+    def save(self, path):
+        data = {"built": self.built, "songs": [encode(song) for song in self.songs]}
+
+        try:
+            write_atomic(path, json.dumps(data))
+        except OSError as e:
+            logging.exception(e)
+
+
+class SearchCache:
+    """Results of recent queries, by part ("store", "youtube"). A part is a
+    tuple of result lists and paging state.
+
+    Entries expire after ``ttl`` seconds. Entries pushed out of memory are
+    written to ``spill``, a PersistentCache, if one is given, and looked up
+    there on a miss.
+
+    A query that extends a cached one, as happens while typing, can be
+    previewed by filtering the results of the cached query until its own
+    results arrive.
+    """
+
+    def __init__(self, max_entries=50, ttl=60 * 60, spill=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.spill = spill
+        self.entries = OrderedDict()  # normalized query -> (timestamp, parts)
+
+    @staticmethod
+    def key(query):
+        return " ".join(tokenize(query))
+
+    def get(self, query):
+        key = self.key(query)
+        entry = self._entry(key)
+        return dict(entry[1]) if entry is not None else {}
+
+    def put(self, query, part, results):
+        key = self.key(query)
+        entry = self._entry(key)
+        if entry is None:
+            entry = self.entries[key] = (time.time(), {})
+
+        entry[1][part] = results
+
+        while len(self.entries) > self.max_entries:
+            self._spill(*self.entries.popitem(last=False))
+
+    def save(self):
+        """Write every entry still in memory to the spill cache."""
+        if self.spill is None:
+            return
+
+        for key, entry in self.entries.items():
+            self._spill(key, entry)
+        self.spill.save()
+
+    def narrow(self, query):
+        """Results of the longest cached prefix of ``query``, filtered."""
+        key = self.key(query)
+        terms = key.split()
+        best = {}
+        now = time.time()
+
+        for cached, (stamp, parts) in self.entries.items():
+            if not cached or not key.startswith(cached) or now - stamp > self.ttl:
+                continue
+            for part, results in parts.items():
+                if part not in best or len(cached) > len(best[part][0]):
+                    best[part] = cached, results
+
+        return {
+            part: filter_results(results, terms) for part, (_, results) in best.items()
+        }
+
+    def _entry(self, key):
+        entry = self.entries.get(key)
+
+        if entry is None and self.spill is not None:
+            value = self.spill.get(key)
+            if value is not None:
+                stamp, parts = value
+                entry = self.entries[key] = (stamp, decode_parts(parts))
+
+        if entry is None:
+            return None
+
+        if time.time() - entry[0] > self.ttl:
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+    def _spill(self, key, entry):
+        if self.spill is not None and time.time() - entry[0] <= self.ttl:
+            stamp, parts = entry
+            self.spill.put(key, [stamp, encode_parts(parts)])
+
+
+def encode_parts(parts):
+    return {
+        part: [
+            [encode(obj) for obj in value if obj is not None]
+            if isinstance(value, list)
+            else value
+            for value in results
+        ]
+        for part, results in parts.items()
+    }
+
+
+def decode_parts(parts):
+    return {
+        part: tuple(
+            [decode(dct) for dct in value] if isinstance(value, list) else value
+            for value in results
+        )
+        for part, results in parts.items()
+    }
+
+
+def filter_results(results, terms):
+    # Lists are filtered; anything else, like a paging token, belongs to the
+    # original query and is dropped.
+    return tuple(
+        [obj for obj in value if obj is not None and matches(obj, terms)]
+        if isinstance(value, list)
+        else None
+        for value in results
+    )
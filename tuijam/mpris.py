@@ -1,5 +1,6 @@
 import logging
 
+from .art import art_url
 from .music_objects import Song, YTVideo
 
 
@@ -52,19 +53,46 @@ def setup_mpris(app):
 <method name="OpenUri">
   <arg type="s" direction="in" />
 </method>
+<signal name="Seeked">
+  <arg name="Position" type="x" />
+</signal>
 </interface>
 </node>
         """
 
         PropertiesChanged = signal()
+        Seeked = signal()
 
         def __init__(self, app):
             self.app = app
+            self.changed = []  # properties to announce in the next signal
+            self.metadata_key = None
+            self.metadata = {}
+
+        def redraw(self):
+            # D-Bus calls are not urwid events, so the loop has to be told
+            # that the screen changed.
+            if self.app.loop is not None:
+                self.app.loop.request_draw()
 
         def emit_property_changed(self, attr):
-            self.PropertiesChanged(
-                "org.mpris.MediaPlayer2.Player", {attr: getattr(self, attr)}, []
-            )
+            # Changes made while handling one event are sent as one signal.
+            if not self.changed:
+                self.app.worker.call_soon(self.flush_changes)
+            if attr not in self.changed:
+                self.changed.append(attr)
+
+        def flush_changes(self):
+            changed, self.changed = self.changed, []
+            if changed:
+                self.PropertiesChanged(
+                    "org.mpris.MediaPlayer2.Player",
+                    {attr: getattr(self, attr) for attr in changed},
+                    [],
+                )
+
+        def emit_seeked(self, seconds):
+            self.Seeked(int(1000000 * seconds))
 
         @property
         def CanQuit(self):
@@ -112,8 +140,17 @@ def setup_mpris(app):
 
         @property
         def Metadata(self):
+            # Rebuilt only when the track (or its stream) changes.
             song = self.app.current_song
+            key = (song, getattr(song, "stream_url", None))
+
+            if key != self.metadata_key:
+                self.metadata_key = key
+                self.metadata = self.build_metadata(song)
 
+            return self.metadata
+
+        def build_metadata(self, song):
             if type(song) == Song:
 
                 logging.info("New song ID: " + str(song.id))
@@ -122,7 +159,8 @@ def setup_mpris(app):
                     "mpris:trackid": Variant(
                         "o", "/org/tuijam/GM_" + str(song.id).replace("-", "_")
                     ),
-                    "mpris:artUrl": Variant("s", song.albumArtRef),
+                    "mpris:artUrl": Variant("s", self.art_uri(song)),
+                    "mpris:length": Variant("x", song.duration * 1000000),
                     "xesam:title": Variant("s", song.title),
                     "xesam:artist": Variant("as", [song.artist]),
                     "xesam:album": Variant("s", song.album),
@@ -135,7 +173,7 @@ def setup_mpris(app):
                     "mpris:trackid": Variant(
                         "o", "/org/tuijam/YT_" + str(song.id).replace("-", "_")
                     ),
-                    "mpris:artUrl": Variant("s", song.thumbnail),
+                    "mpris:artUrl": Variant("s", self.art_uri(song)),
                     "xesam:title": Variant("s", song.title),
                     "xesam:artist": Variant("as", [song.channel]),
                     "xesam:album": Variant("s", ""),
@@ -145,6 +183,23 @@ def setup_mpris(app):
             else:
                 return {}
 
+        def art_uri(self, song):
+            # A local copy spares every client a download. Until it is
+            # there, the remote URL is published and updated later.
+            url = art_url(song)
+            uri = self.app.art.uri(url)
+
+            if uri is None:
+                self.app.art.fetch(url, callback=lambda uri: self.art_ready(song))
+                return url or ""
+
+            return uri
+
+        def art_ready(self, song):
+            if self.app.current_song is song:
+                self.metadata_key = None
+                self.emit_property_changed("Metadata")
+
         @property
         def Volume(self):
             return self.app.volume / 8.0
@@ -155,14 +210,12 @@ def setup_mpris(app):
             self.app.volume = int(volume * 8)
             self.app.player.volume = volume * 100
             self.emit_property_changed("Volume")
+            self.redraw()
 
         @property
         def Position(self):
-            try:
-                return int(1000000 * self.app.player.time_pos)
-
-            except TypeError:
-                return 0
+            # last value reported by the mpv observer, no round trip to mpv
+            return int(1000000 * (self.app.time_pos or 0))
 
         @property
         def MinimumRate(self):
@@ -200,28 +253,42 @@ def setup_mpris(app):
 
         def Next(self):
             self.app.queue_panel.play_next()
+            self.redraw()
 
         def Previous(self):
             self.app.queue_panel.play_previous()
+            self.redraw()
 
         def Pause(self):
             if self.app.play_state == "play":
                 self.app.toggle_play()
+                self.redraw()
 
         def PlayPause(self):
             self.app.toggle_play()
+            self.redraw()
 
         def Stop(self):
             self.app.stop()
+            self.redraw()
 
         def Play(self, song_id):
             self.app.toggle_play()
+            self.redraw()
 
         def Seek(self, offset):
-            pass
+            self.app.seek(offset / 1000000)
+            self.redraw()
 
         def SetPosition(self, track_id, position):
-            pass
+            # Ignored if the track changed since the client looked, as
+            # required by the specification.
+            trackid = self.Metadata.get("mpris:trackid")
+            if trackid is None or trackid.unpack() != track_id or position < 0:
+                return
+
+            self.app.seek_to(position / 1000000)
+            self.redraw()
 
         def OpenUri(self, uri):
             pass
@@ -1,6 +1,7 @@
 from itertools import zip_longest
 import logging
 import json
+import sys
 
 import urwid
 
@@ -8,7 +9,15 @@ from tuijam import _
 from .utility import sec_to_min_sec
 
 
+def intern(s):
+    # Artist/album names, ids and art URLs repeat across thousands of songs;
+    # share a single copy of each.
+    return sys.intern(s) if type(s) is str else s
+
+
 class MusicObject:
+    __slots__ = ()
+
     @staticmethod
     def to_ui(*txts, weights=()):
         first, *rest = [
@@ -37,6 +46,22 @@ class MusicObject:
 
 
 class Song(MusicObject):
+    __slots__ = (
+        "title",
+        "album",
+        "albumId",
+        "albumArtRef",
+        "artist",
+        "artistId",
+        "id",
+        "type",
+        "trackType",
+        "duration",
+        "rating",
+        "stream_url",
+        "lastfm_scrobbled",
+        "lastfm_ts_start",
+    )
     ui_weights = (1, 2, 1, 0.2, 0.2)
 
     def __init__(
@@ -54,14 +79,14 @@ class Song(MusicObject):
         rating,
     ):
         self.title = title
-        self.album = album
-        self.albumId = albumId
-        self.albumArtRef = albumArtRef
-        self.artist = artist
-        self.artistId = artistId
+        self.album = intern(album)
+        self.albumId = intern(albumId)
+        self.albumArtRef = intern(albumArtRef)
+        self.artist = intern(artist)
+        self.artistId = intern(artistId)
         self.id = id_
         self.type = type_
-        self.trackType = trackType
+        self.trackType = intern(trackType)
         self.length = length
         self.rating = rating
         self.stream_url = ""
@@ -69,6 +94,19 @@ class Song(MusicObject):
     def __repr__(self):
         return f"<Song title:{self.title}, album:{self.album}, artist:{self.artist}>"
 
+    @property
+    def length(self):
+        # stored packed as whole seconds, exposed as (minutes, seconds)
+        return sec_to_min_sec(self.duration)
+
+    @length.setter
+    def length(self, length):
+        if isinstance(length, (list, tuple)):
+            minutes, seconds = length
+            length = minutes * 60 + seconds
+
+        self.duration = int(length)
+
     def __str__(self):
         return "{} {}{}".format(self.title, _("by "), self.artist)
 
@@ -114,7 +152,7 @@ class Song(MusicObject):
                 type_ = "store"
 
             trackType = d.get("trackType", None)
-            length = sec_to_min_sec(int(d["durationMillis"]) / 1000)
+            length = int(d["durationMillis"]) // 1000
 
             # rating scheme
             #  0 - No Rating
@@ -141,18 +179,27 @@ class Song(MusicObject):
 
 
 class YTVideo(MusicObject):
+    __slots__ = (
+        "title",
+        "channel",
+        "thumbnail",
+        "id",
+        "stream_url",
+        "lastfm_scrobbled",
+        "lastfm_ts_start",
+    )
     ui_weights = (4, 1)
 
     def __init__(self, title, channel, thumbnail, id_):
 
         self.title = title
-        self.channel = channel
+        self.channel = intern(channel)
         self.thumbnail = thumbnail
         self.id = id_
         self.stream_url = ""
 
     def __repr__(self):
-        return f"<YTVideo title:{self.title}, channel:{self.artist}>" # TODO check if it is a bug
+        return f"<YTVideo title:{self.title}, channel:{self.channel}>"
 
     def __str__(self):
         return "{} {}{}".format(self.title, _("by "), self.channel)
@@ -183,11 +230,13 @@ class YTVideo(MusicObject):
 
 
 class Album(MusicObject):
+    __slots__ = ("title", "artist", "artistId", "year", "id")
+
     def __init__(self, title, artist, artistId, year, id_):
 
         self.title = title
-        self.artist = artist
-        self.artistId = artistId
+        self.artist = intern(artist)
+        self.artistId = intern(artistId)
         self.year = year
         self.id = id_
 
@@ -233,9 +282,11 @@ class Album(MusicObject):
 
 
 class Artist(MusicObject):
+    __slots__ = ("name", "id")
+
     def __init__(self, name, id_):
-        self.name = name
-        self.id = id_
+        self.name = intern(name)
+        self.id = intern(id_)
 
     def __repr__(self):
         return f"<Artist name:{self.name}>"
@@ -261,6 +312,7 @@ class Artist(MusicObject):
 
 
 class Situation(MusicObject):
+    __slots__ = ("title", "description", "id", "stations")
     ui_weights = (0.2, 1)
 
     def __init__(self, title, description, id_, stations):
@@ -315,6 +367,8 @@ class Situation(MusicObject):
 
 
 class RadioStation(MusicObject):
+    __slots__ = ("title", "seeds", "id")
+
     def __init__(self, title, seeds, id_=None):
         self.title = title
         self.seeds = seeds
@@ -351,18 +405,22 @@ class RadioStation(MusicObject):
 
 
 class Playlist(MusicObject):
+    __slots__ = ("name", "songs", "id", "modified", "share_token")
     ui_weights = (0.4, 1)
 
-    def __init__(self, name, songs=None, id_=None):
+    def __init__(self, name, songs=None, id_=None, modified=None, share_token=None):
         self.name = name
-        self.songs = songs
+        self.songs = songs  # None until the track list is loaded
         self.id = id_
+        self.modified = modified
+        self.share_token = share_token
 
     def __repr__(self):
         return f"<Playlist name:{self.name}>"
 
     def ui(self):
-        return self.to_ui(self.name, str(len(self.songs)), weights=self.ui_weights)
+        count = "-" if self.songs is None else str(len(self.songs))
+        return self.to_ui(self.name, count, weights=self.ui_weights)
 
     @classmethod
     def header(cls):
@@ -374,35 +432,62 @@ class Playlist(MusicObject):
         try:
             name = d["name"]
             id_ = d["id"]
+            modified = d.get("lastModifiedTimestamp")
+            share_token = d.get("shareToken")
+
+            # Playlist metadata comes without tracks; they are loaded when
+            # the playlist is opened.
+            if "tracks" not in d:
+                return Playlist(name, None, id_, modified, share_token)
+
             songs = [
                 Song.from_dict(song["track"]) for song in d["tracks"] if "track" in song
             ]
 
             if songs:
-                return Playlist(name, songs, id_)
+                return Playlist(name, songs, id_, modified, share_token)
 
         except KeyError as e:
             logging.exception(f"Missing Key {e} in dict \n{d}")
 
 
+def encode(obj) -> dict:
+    state = {}
+    for key in obj.__slots__:
+        try:
+            state[key] = getattr(obj, key)
+        except AttributeError:  # never set
+            pass
+
+    if isinstance(obj, Song):
+        # keep the on-disk format of older versions
+        state["length"] = list(obj.length)
+        state.pop("duration", None)
+
+    return {"__%s__" % obj.__class__.__name__: state}
+
+
+def decode(dct: dict):
+    for type_name, value in dct.items():
+        cls = globals()[type_name.strip("_")]
+        obj = cls.__new__(cls)
+        for key, val in value.items():
+            try:
+                setattr(obj, key, intern(val))
+            except AttributeError:
+                logging.warning(f"Ignoring unknown attribute {key} of {type_name}")
+        return obj
+
+
 def serialize(music_objects: list) -> str:
     class CustomEncoder(json.JSONEncoder):
         def default(self, obj):
             if isinstance(obj, (Song, YTVideo)):
-                key = "__%s__" % obj.__class__.__name__
-                return {key: obj.__dict__}
+                return encode(obj)
             return json.JSONEncoder.default(self, obj)
 
     return json.dumps(music_objects, cls=CustomEncoder)
 
 
 def deserialize(music_object_json: str) -> list:
-    def decode(dct):
-        for type_name, value in dct.items():
-            cls = globals()[type_name.strip("_")]
-            obj = cls.__new__(cls)
-            for key, val in value.items():
-                setattr(obj, key, val)
-            return obj
-
     return [decode(dct) for dct in json.loads(music_object_json)]
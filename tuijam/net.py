@@ -0,0 +1,86 @@
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from tuijam import __version__
+
+USER_AGENT = "TUIJam/" + __version__
+TIMEOUT = 10  # seconds, for both connecting and reading
+POOL_SIZE = 4  # kept-alive connections per host
+
+_session = None
+_lock = threading.Lock()
+_timeout = TIMEOUT
+_pool_size = POOL_SIZE
+
+
+def configure(timeout=TIMEOUT, pool_size=POOL_SIZE):
+    """Set the defaults for the shared session. Call before the first request."""
+    global _timeout, _pool_size
+
+    _timeout = timeout
+    _pool_size = pool_size
+
+
+def session():
+    """The HTTP session shared by every client in TUIJam.
+
+    Connections are kept alive and reused, so only the first request to a
+    host pays for the TCP and TLS handshakes.
+    """
+    global _session
+
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            _session = requests.Session()
+            _session.headers["User-Agent"] = USER_AGENT
+
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=_pool_size)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+
+        return _session
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", _timeout)
+    return session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def warm_up(worker, urls):
+    """Open connections to the hosts of ``urls`` in the background."""
+    seen = set()
+
+    for url in urls:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+        if origin not in seen:
+            seen.add(origin)
+            worker.submit(_connect, origin)
+
+
+def _connect(origin):
+    try:
+        request("HEAD", origin, allow_redirects=False)
+    except Exception as e:
+        logging.info(f"warm-up of {origin} failed: {e}")
+
+
+def close():
+    global _session
+
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,211 @@
+import random
+
+
+class PlayQueue:
+    """Sequence of queued music objects optimized for playback queues.
+
+    Items are stored in a list of chunks of bounded size. A Fenwick tree over
+    the chunk lengths maps positions to chunks in O(log n), so inserting,
+    removing or moving an item only shifts the items of a single chunk.
+    Consuming the head is O(1): popped slots at the start of the first chunk
+    are only skipped over, and reused by ``appendleft``.
+    """
+
+    LOAD = 256  # chunks are split once they grow past twice this size
+
+    def __init__(self, items=()):
+        self._chunks = []
+        self._tree = [0]  # 1-based Fenwick tree over len(chunk)
+        self._head = 0  # consumed slots at the start of the first chunk
+        self._len = 0
+        self.extend(items)
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len > 0
+
+    def __iter__(self):
+        for i, chunk in enumerate(self._chunks):
+            yield from (chunk[self._head:] if i == 0 else chunk)
+
+    def __getitem__(self, idx):
+        k, j = self._locate(idx)
+        return self._chunks[k][j]
+
+    def __setitem__(self, idx, obj):
+        k, j = self._locate(idx)
+        self._chunks[k][j] = obj
+
+    def __delitem__(self, idx):
+        self.pop(idx)
+
+    def __repr__(self):
+        return f"<PlayQueue len:{self._len}>"
+
+    def append(self, obj):
+        if self._chunks and len(self._chunks[-1]) < 2 * self.LOAD:
+            self._chunks[-1].append(obj)
+            self._add(len(self._chunks) - 1, 1)
+        else:
+            self._chunks.append([obj])
+            self._tree_append(1)
+
+        self._len += 1
+
+    def appendleft(self, obj):
+        if self._head:
+            self._head -= 1
+            self._chunks[0][self._head] = obj
+            self._len += 1
+        else:
+            self.insert(0, obj)
+
+    def extend(self, objs):
+        for obj in objs:
+            self.append(obj)
+
+    def insert(self, idx, obj):
+        if idx < 0:
+            idx = max(idx + self._len, 0)
+        if idx >= self._len:
+            return self.append(obj)
+
+        k, j = self._locate(idx)
+        self._chunks[k].insert(j, obj)
+        self._len += 1
+
+        if len(self._chunks[k]) > 2 * self.LOAD:
+            self._rebuild()
+        else:
+            self._add(k, 1)
+
+    def popleft(self):
+        if not self._len:
+            raise IndexError("pop from an empty PlayQueue")
+
+        first = self._chunks[0]
+        obj = first[self._head]
+        first[self._head] = None
+        self._head += 1
+        self._len -= 1
+
+        if self._head == len(first):
+            del self._chunks[0]
+            self._head = 0
+            self._rebuild()
+
+        return obj
+
+    def pop(self, idx=-1):
+        if idx == 0 or idx == -self._len:
+            return self.popleft()
+
+        k, j = self._locate(idx)
+        obj = self._chunks[k].pop(j)
+        self._len -= 1
+
+        if len(self._chunks[k]) - (self._head if k == 0 else 0) <= self.LOAD // 4:
+            self._merge(k)
+        else:
+            self._add(k, -1)
+
+        return obj
+
+    def move(self, src, dst):
+        self.insert(dst, self.pop(src))
+
+    def swap(self, idx1, idx2):
+        k1, j1 = self._locate(idx1)
+        k2, j2 = self._locate(idx2)
+        c1, c2 = self._chunks[k1], self._chunks[k2]
+        c1[j1], c2[j2] = c2[j2], c1[j1]
+
+    def clear(self):
+        self._chunks = []
+        self._head = 0
+        self._len = 0
+        self._rebuild()
+
+    def shuffle(self, rng=random):
+        items = list(self)
+        rng.shuffle(items)
+        self.clear()
+        self.extend(items)
+
+    def _locate(self, idx):
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("PlayQueue index out of range")
+
+        # Fenwick descent for the chunk containing raw position idx + head.
+        rem = idx + self._head
+        pos = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= rem:
+                pos = nxt
+                rem -= self._tree[nxt]
+            step >>= 1
+
+        return pos, rem
+
+    def _add(self, k, delta):
+        i = k + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_append(self, value):
+        i = len(self._tree)
+        lowest = i - (i & -i)
+        j = i - 1
+
+        while j > lowest:
+            value += self._tree[j]
+            j -= j & -j
+
+        self._tree.append(value)
+
+    def _merge(self, k):
+        # Fold an undersized chunk into a neighbour, dropping it if empty.
+        chunk = self._chunks[k]
+
+        if k == 0 and self._head:
+            del chunk[: self._head]
+            self._head = 0
+
+        if chunk and len(self._chunks) > 1:
+            if k + 1 < len(self._chunks):
+                self._chunks[k + 1][:0] = chunk
+            else:
+                self._chunks[k - 1].extend(chunk)
+            chunk.clear()
+
+        if not chunk:
+            del self._chunks[k]
+
+        self._rebuild()
+
+    def _rebuild(self):
+        # Drop consumed head slots, split oversized chunks and recompute the
+        # tree. Only needed when the set of chunks changes.
+        if self._chunks and self._head:
+            del self._chunks[0][: self._head]
+            self._head = 0
+
+        chunks = []
+        for chunk in self._chunks:
+            while len(chunk) > 2 * self.LOAD:
+                chunks.append(chunk[: self.LOAD])
+                chunk = chunk[self.LOAD :]
+            chunks.append(chunk)
+        self._chunks = chunks
+
+        self._tree = [0]
+        for chunk in self._chunks:
+            self._tree_append(len(chunk))
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from itertools import islice
+from urllib.parse import urlparse, parse_qs
+
+from .music_objects import Song
+
+# Lifetime assumed for URLs that carry no expire parameter, and how long before
+# expiry a cached URL is considered stale.
+DEFAULT_LIFETIME = 60
+EXPIRY_MARGIN = 15
+# The next song's URL is renewed this long before it expires, so that it is
+# still valid whenever Next is pressed.
+RENEW_MARGIN = 30
+
+
+def url_expiry(url, now=None):
+    if now is None:
+        now = time.time()
+
+    try:
+        return int(parse_qs(urlparse(url).query)["expire"][0])
+    except (KeyError, IndexError, ValueError):
+        return now + DEFAULT_LIFETIME
+
+
+class StreamUrlCache:
+    """Signed stream URLs for songs, resolved ahead of time on the worker pool."""
+
+    def __init__(self, app, prefetch=3):
+        self.app = app
+        self.prefetch = prefetch
+        self.urls = {}  # song id -> (url, expiry timestamp)
+        self.resolving = set()  # song ids being resolved ahead of time
+        self.lock = threading.Lock()
+
+    def get(self, song):
+        with self.lock:
+            url, expiry = self.urls.get(song.id, (None, 0))
+
+        if url is not None and expiry - EXPIRY_MARGIN > time.time():
+            return url
+
+    def resolve(self, song):
+        url = self.get(song)
+        if url is not None:
+            return url
+
+        return self._fetch(song)
+
+    def invalidate(self, song):
+        with self.lock:
+            self.urls.pop(song.id, None)
+
+    def prefetch_queue(self, queue):
+        if self.prefetch <= 0:
+            return
+
+        upcoming = [
+            song for song in islice(queue, self.prefetch) if isinstance(song, Song)
+        ]
+
+        with self.lock:
+            now = time.time()
+            # Forget URLs that expired or belong to songs no longer coming up.
+            keep = {song.id for song in upcoming}
+            current = self.app.current_song
+            if current is not None:
+                keep.add(current.id)
+            self.urls = {
+                id_: entry
+                for id_, entry in self.urls.items()
+                if id_ in keep and entry[1] > now
+            }
+
+        for song in upcoming:
+            if self.get(song) is None and song.id not in self.resolving:
+                self.resolving.add(song.id)
+                self.app.worker.submit(self._resolve_ahead, song)
+
+    def keep_next_fresh(self, queue):
+        """Renew the URL of the head of ``queue`` before it expires.
+
+        URLs only live for about a minute, so one resolved when the queue
+        last changed is usually stale by the time the current song ends.
+        """
+        if self.prefetch <= 0 or not len(queue) or not isinstance(queue[0], Song):
+            return
+
+        song = queue[0]
+        with self.lock:
+            expiry = self.urls.get(song.id, (None, 0))[1]
+
+        if expiry - RENEW_MARGIN > time.time() or song.id in self.resolving:
+            return
+
+        self.resolving.add(song.id)
+        self.app.worker.submit(self._resolve_ahead, song, renew=True)
+
+    def _fetch(self, song):
+        url = self.app.g_api.get_stream_url(song.id)
+        with self.lock:
+            self.urls[song.id] = (url, url_expiry(url))
+
+        return url
+
+    def _resolve_ahead(self, song, renew=False):
+        try:
+            return self._fetch(song) if renew else self.resolve(song)
+        except Exception as e:
+            logging.exception(e)
+        finally:
+            self.resolving.discard(song.id)
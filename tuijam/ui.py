@@ -1,3 +1,6 @@
+from bisect import bisect_right
+from time import perf_counter
+
 import urwid
 
 from tuijam import _
@@ -10,8 +13,11 @@ from .music_objects import (
     RadioStation,
     Playlist,
 )
+from .play_queue import PlayQueue
 from .utility import sec_to_min_sec
 
+PAGE_SIZE = 30  # search results per category shown, and fetched, at a time
+
 WELCOME = """
    ▄             ▀       ▀               
  ▄▄█▄▄  ▄   ▄  ▄▄▄     ▄▄▄    ▄▄▄   ▄▄▄▄▄
@@ -47,7 +53,10 @@ controls = dict(
     queue="q",
     queue_next="Q",
     back="backspace",
+    forward="F",
     radio="r",
+    sort="s",
+    sort_reverse="S",
     # queue panel
     swap_up=["u", "shift up"],
     swap_down=["d", "shift down"],
@@ -82,9 +91,33 @@ controls = dict(
 
 
 class SearchInput(urwid.Edit):
+    MIN_CHARS = 2  # shortest text searched for while typing
+
     def __init__(self, app):
         self.app = app
+        self.alarm = None
         super().__init__(_("search > "), multiline=False, allow_tab=False)
+        urwid.connect_signal(self, "postchange", self.text_changed)
+
+    def text_changed(self, widget, old_text):
+        if not self.app.search_as_you_type:
+            return
+
+        # Only search once typing pauses, and drop results for older text.
+        if self.alarm is not None:
+            self.app.loop.remove_alarm(self.alarm)
+            self.alarm = None
+
+        self.app.cancel_search()
+
+        if len(self.edit_text.strip()) >= self.MIN_CHARS:
+            self.alarm = self.app.loop.set_alarm_in(
+                self.app.search_delay, self.search_as_you_type
+            )
+
+    def search_as_you_type(self, loop, user_data):
+        self.alarm = None
+        self.app.search(self.edit_text, incremental=True)
 
     def keypress(self, size, key):
         if key == "enter":
@@ -100,55 +133,178 @@ class SearchInput(urwid.Edit):
 
 
 class SearchPanel(urwid.ListBox):
+    HISTORY_ROWS = 20000  # results kept in the back/forward history
+
     class SearchResults:
-        def __init__(self, categories):
-            self.artists = []
-            self.albums = []
-            self.songs = []
-            self.situations = []
-            self.radio_stations = []
-            self.playlists = []
-            self.yt_vids = []
+        CATEGORIES = (
+            ("artists", Artist),
+            ("albums", Album),
+            ("songs", Song),
+            ("situations", Situation),
+            ("radio_stations", RadioStation),
+            ("playlists", Playlist),
+            ("yt_vids", YTVideo),
+        )
+        CATEGORY_OF = {cls: name for name, cls in CATEGORIES}
+
+        SORT_COLUMNS = (None, "title", "artist", "album", "length", "rating")
+        SORT_KEYS = {
+            "title": lambda song: song.title.casefold(),
+            "artist": lambda song: (song.artist.casefold(), song.album.casefold()),
+            "album": lambda song: song.album.casefold(),
+            "length": lambda song: song.duration,
+            "rating": lambda song: -{1: -1, 5: 1}.get(song.rating, 0),  # liked first
+        }
+
+        def __init__(self, categories, pagers=None, limit=PAGE_SIZE):
+            for name, _cls in self.CATEGORIES:
+                setattr(self, name, [])
+
             for category in categories:
-                if not category:
-                    continue
-                if isinstance(category[0], Artist):
-                    self.artists = category
-                elif isinstance(category[0], Album):
-                    self.albums = category
-                elif isinstance(category[0], Song):
-                    self.songs = category
-                elif isinstance(category[0], Situation):
-                    self.situations = category
-                elif isinstance(category[0], RadioStation):
-                    self.radio_stations = category
-                elif isinstance(category[0], Playlist):
-                    self.playlists = category
-                elif isinstance(category[0], YTVideo):
-                    self.yt_vids = category
+                if category:
+                    setattr(self, self.CATEGORY_OF[type(category[0])], list(category))
+
+            # Only the first ``limit`` items of a category are shown; more are
+            # revealed, or fetched through its pager, once the user scrolls to
+            # the end of it.
+            self.limits = {name: limit for name, _cls in self.CATEGORIES}
+            self.pagers = dict(pagers or {})  # category name -> pager
+            self.loading = set()  # pagers with a page in flight
+
+            # Songs can be sorted by a column; ``unsorted`` keeps the order in
+            # which they came, ``sort_keys`` the keys of each column used.
+            self.unsorted = self.songs
+            self.sort = (None, False)
+            self.sort_keys = {}
+
+            self._reindex()
 
         def __iter__(self):
-            yield self.artists
-            yield self.albums
-            yield self.songs
-            yield self.situations
-            yield self.radio_stations
-            yield self.playlists
-            yield self.yt_vids
+            for name, _cls in self.CATEGORIES:
+                yield getattr(self, name)
+
+        def __len__(self):
+            return self.total
+
+        def visible(self, name):
+            limit = self.limits[name]
+            category = getattr(self, name)
+            return category if limit is None else category[:limit]
+
+        def _reindex(self):
+            # Rows are a header (the category's class) followed by its shown
+            # items. offsets[i] is the row of the header of sections[i].
+            self.sections = []
+            self.offsets = []
+            self.total = 0
+
+            for name, _cls in self.CATEGORIES:
+                items = self.visible(name)
+                if items:
+                    self.sections.append((name, items))
+                    self.offsets.append(self.total)
+                    self.total += len(items) + 1
+
+        def _section(self, position):
+            if not 0 <= position < self.total:
+                raise IndexError(position)
+
+            i = bisect_right(self.offsets, position) - 1
+            name, items = self.sections[i]
+            return name, items, position - self.offsets[i]
+
+        def row(self, position):
+            _name, items, offset = self._section(position)
+            return type(items[0]) if offset == 0 else items[offset - 1]
+
+        def category_end(self, position):
+            """Name of the category whose last shown row is ``position``."""
+            try:
+                name, items, offset = self._section(position)
+            except (IndexError, TypeError):
+                return None
+
+            return name if offset == len(items) else None
+
+        def reveal(self, name):
+            """Show another page of items that are already there."""
+            limit = self.limits[name]
+            if limit is None or limit >= len(getattr(self, name)):
+                return False
+
+            self.limits[name] = limit + PAGE_SIZE
+            self._reindex()
+            return True
+
+        def extend(self, name, items):
+            from .library import merge
+
+            if name == "songs":
+                before = len(self.unsorted)
+                self.unsorted = merge(self.unsorted, items)
+                for column, keys in self.sort_keys.items():
+                    keys.extend(map(self.SORT_KEYS[column], self.unsorted[before:]))
+                self.sort_songs(*self.sort)
+                return len(self.unsorted) > before
+
+            category = getattr(self, name)
+            setattr(self, name, merge(category, items))
+            self._reindex()
+            return len(getattr(self, name)) > len(category)
+
+        def sort_songs(self, column, reverse=False):
+            self.sort = (column, reverse)
+
+            if column is None:
+                self.songs = self.unsorted
+            else:
+                keys = self.sort_keys.get(column)
+                if keys is None:
+                    keys = self.sort_keys[column] = [
+                        self.SORT_KEYS[column](song) for song in self.unsorted
+                    ]
+
+                order = sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+                self.songs = [self.unsorted[i] for i in order]
+
+            self._reindex()
+
+        def keep_view(self, other):
+            """Show as much, sorted the same way, as ``other`` did."""
+            self.limits.update(other.limits)
+            self.sort_songs(*other.sort)
 
     def __init__(self, app):
         self.app = app
-        self.walker = urwid.SimpleFocusListWalker([])
-        self.search_history = []
+        self.walker = LazyWalker(self.row_count, self.row_widget)
+        self.search_history = []  # (focus, results, title) of earlier views
+        self.search_forward = []  # views left by going back
+        self.history_size = 50
         self.search_results = self.SearchResults([])
         self.line_box = None
+        self.title = _("Search Results")
         self.viewing_previous_songs = False
+        self.provisional = False  # showing results of a search made while typing
+        self.welcome = urwid.Text(WELCOME, align="center")
 
         super().__init__(self.walker)
 
-        self.walker.append(urwid.Text(WELCOME, align="center"))
+    def row_count(self):
+        if self.welcome is not None:
+            return 1
+
+        return len(self.search_results)
+
+    def row_widget(self, position):
+        if self.welcome is not None:
+            return self.welcome
+
+        row = self.search_results.row(position)
+        return row.header() if isinstance(row, type) else row.ui()
 
     def keypress(self, size, key):
+        self.provisional = False  # the results are being used
+
         if key in controls["queue"] or key in controls["queue_next"]:
 
             add_to_front = key in controls["queue_next"]
@@ -162,23 +318,28 @@ class SearchPanel(urwid.ListBox):
             elif type(selected) == Album:
                 self.app.queue_panel.add_album_to_queue(selected, add_to_front)
             elif type(selected) == RadioStation:
-                radio_song_list = self.app.get_radio_songs(
-                    selected.get_station_id(self.app.g_api)
+                self.app.start_radio(
+                    lambda: selected.get_station_id(self.app.g_api), add_to_front
                 )
-
-                if add_to_front:
-                    radio_song_list = reversed(radio_song_list)
-
-                for song in radio_song_list:
-                    self.app.queue_panel.add_song_to_queue(song, add_to_front)
             elif type(selected) == Playlist:
-                self.app.queue_panel.add_songs_to_queue(selected.songs, add_to_front)
+                self.app.load_playlist(
+                    selected,
+                    lambda playlist: self.app.queue_panel.add_songs_to_queue(
+                        playlist.songs, add_to_front
+                    ),
+                )
 
         elif key in controls["expand"]:
             if self.selected_search_obj() is not None:
                 self.app.expand(self.selected_search_obj())
         elif key in controls["back"]:
             self.back()
+        elif key in controls["forward"]:
+            self.forward()
+        elif key in controls["sort"]:
+            self.sort_songs()
+        elif key in controls["sort_reverse"]:
+            self.sort_songs(reverse=True)
         elif key in controls["radio"]:
             if self.selected_search_obj() is not None:
                 self.app.create_radio_station(self.selected_search_obj())
@@ -189,76 +350,244 @@ class SearchPanel(urwid.ListBox):
         else:
             super().keypress(size, key)
 
+        self.load_more()
+
+    def mouse_event(self, size, event, button, col, row, focus):
+        handled = super().mouse_event(size, event, button, col, row, focus)
+        self.load_more()
+        return handled
+
+    def remember(self, stack):
+        # Views are kept with their focus and title. The stack is bounded in
+        # views and in rows, so memory use stays flat in long sessions.
+        stack.append((self.get_focus()[1], self.search_results, self.title))
+
+        def size(view):
+            return sum(map(len, view[1]))
+
+        rows = sum(map(size, stack))
+        while len(stack) > self.history_size or (
+            len(stack) > 1 and rows > self.HISTORY_ROWS
+        ):
+            rows -= size(stack.pop(0))
+
     def back(self):
-        if self.search_history:
-            prev_focus, search_history = self.search_history.pop()
+        self.navigate(self.search_history, self.search_forward)
 
-            self.set_search_results(list(search_history))
-            self.viewing_previous_songs = False
-            self.line_box.set_title(_("Search Results"))
+    def forward(self):
+        self.navigate(self.search_forward, self.search_history)
 
-            try:
-                self.set_focus(prev_focus)
-            except:
-                pass
+    def navigate(self, source, destination):
+        if not source:
+            return
+
+        self.app.cancel_search()
+
+        if not self.viewing_previous_songs:
+            self.remember(destination)
+
+        prev_focus, search_results, title = source.pop()
+
+        self.search_results = search_results
+        self.welcome = None
+        self.walker.changed()
+        self.viewing_previous_songs = False
+        self.provisional = False
+        self.title = title
+        self.show_title()
+
+        try:
+            self.set_focus(prev_focus)
+        except:
+            pass
 
     def update_search_results(
-        self, *categories, title=None, isprevsong=False
+        self, *categories, title=None, isprevsong=False, provisional=False,
+        pagers=None
     ):
         if title is None:
             title = _("Search Results")
 
-        if not self.viewing_previous_songs:  # only remember search history
-            self.search_history.append((self.get_focus()[1], self.search_results))
+        # only remember search history, and only the view from before a run
+        # of searches made while typing
+        if not self.viewing_previous_songs and not self.provisional:
+            self.remember(self.search_history)
+            self.search_forward.clear()
 
         self.viewing_previous_songs = isprevsong
+        self.provisional = provisional
+
+        self.set_search_results(categories, pagers)
+        self.title = title
+        self.show_title()
+
+    def replace_search_results(self, *categories, pagers=None):
+        # Show results that were completed by late answers, keeping the
+        # current focus and how much of each category was shown.
+        focus = self.walker.get_focus()[1]
+        previous = self.search_results
+        self.set_search_results(categories, pagers)
+        self.search_results.keep_view(previous)
+        self.walker.changed()
 
-        self.set_search_results(categories)
-        self.line_box.set_title(title)
+        if focus is not None and focus < len(self.walker):
+            self.walker.set_focus(focus)
 
     def view_previous_songs(self, songs, yt_vids):
+        self.app.cancel_search()
         self.update_search_results(
             songs, yt_vids, title=_("Previous Songs"), isprevsong=True
         )
 
-    def set_search_results(self, categories):
-        def filter_none(lst, limit=30):
-            filtered = [obj for obj in lst if obj is not None]
+    def set_search_results(self, categories, pagers=None):
+        limit = None if self.viewing_previous_songs else PAGE_SIZE
+        categories = [[obj for obj in cat if obj is not None] for cat in categories]
+        self.search_results = self.SearchResults(categories, pagers, limit)
+        self.welcome = None
+        self.walker.changed()
 
-            if self.viewing_previous_songs:
-                return filtered
-            else:
-                return filtered[:limit]
+        if self.walker:
+            self.walker.set_focus(1)
 
-        categories = [filter_none(cat) for cat in categories]
-        self.search_results = self.SearchResults(categories)
-        self.walker.clear()
+    def show_title(self):
+        column, reverse = self.search_results.sort
+        if column is None:
+            self.line_box.set_title(self.title)
+            return
 
-        for category in self.search_results:
-            if category:
-                self.walker.append(type(category[0]).header())
+        labels = {
+            "title": _("Title"),
+            "artist": _("Artist"),
+            "album": _("Album"),
+            "length": _("Length"),
+            "rating": _("Rating"),
+        }
+        arrow = "▼" if reverse else "▲"
+        self.line_box.set_title(f"{self.title} ({labels[column]} {arrow})")
+
+    def sort_songs(self, reverse=False):
+        # Cycles through the sort columns, or flips the direction.
+        results = self.search_results
+        column, descending = results.sort
+
+        if reverse:
+            descending = not descending
+        else:
+            columns = results.SORT_COLUMNS
+            column = columns[(columns.index(column) + 1) % len(columns)]
+
+        results.sort_songs(column, descending)
+        self.walker.changed()
+        self.show_title()
+
+    def load_more(self):
+        # Called after the focus moved: at the end of a category, show more
+        # of it, fetching the next page if everything fetched is shown.
+        results = self.search_results
+        name = results.category_end(self.walker.get_focus()[1])
+        if name is None:
+            return
 
-            for item in category:
-                self.walker.append(item.ui())
+        if results.reveal(name):
+            self.walker.changed()
+            return
 
-        if self.walker:
-            self.walker.set_focus(1)
+        pager = results.pagers.get(name)
+        if pager is None or pager in results.loading:
+            return
+
+        def done(pages, more=True):
+            results.loading.discard(pager)
+
+            for page_name, items in pages.items():
+                grew = results.extend(page_name, items)
+                if not (grew and more):
+                    results.pagers.pop(page_name, None)
+
+            if results is self.search_results:
+                focus = self.walker.get_focus()[1]
+                results.reveal(name)
+                self.walker.changed()
+                self.walker.set_focus(focus)
+
+        results.loading.add(pager)
+        pager(done)
 
     def selected_search_obj(self):
         focus_id = self.walker.get_focus()[1]
 
         try:
-            for category in self.search_results:
-                if category:
-                    focus_id -= 1
+            row = self.search_results.row(focus_id)
+        except (IndexError, TypeError):
+            return
 
-                    if focus_id < len(category):
-                        return category[focus_id]
+        if not isinstance(row, type):
+            return row
 
-                    focus_id -= len(category)
 
-        except (IndexError, TypeError):
-            pass
+class FrameLoop(urwid.MainLoop):
+    """Main loop that draws at most ``fps`` frames per second.
+
+    urwid draws the screen whenever its event loop goes idle. Here the first
+    idle after a quiet period is drawn right away; idles following it within
+    the same frame only mark the screen dirty, and a single draw at the start
+    of the next frame covers all of them.
+    """
+
+    def __init__(self, *args, fps=30, **kwargs):
+        super(FrameLoop, self).__init__(*args, **kwargs)
+        self.interval = 1 / fps if fps else 0  # 0 draws on every idle
+        self.last_frame = 0
+        self.frame_alarm = None
+        self.frame_due = False
+        self.updates = 0
+        self.frames = 0
+        self.draw_time = 0
+        self.slowest = 0
+
+    def entering_idle(self):
+        if not self.screen.started:
+            return
+
+        self.updates += 1
+        if self.frame_due or perf_counter() - self.last_frame >= self.interval:
+            self.draw_frame()
+        else:
+            self.request_draw()
+
+    def request_draw(self):
+        """Draw at the next frame, for changes made outside of urwid's own
+        event sources (e.g. D-Bus calls)."""
+        if self.frame_alarm is None:
+            delay = max(0, self.last_frame + self.interval - perf_counter())
+            self.frame_alarm = self.set_alarm_in(delay, self._frame_due)
+
+    def draw_frame(self):
+        if self.frame_alarm is not None:
+            self.remove_alarm(self.frame_alarm)
+            self.frame_alarm = None
+
+        self.frame_due = False
+        start = perf_counter()
+        self.draw_screen()
+        self.last_frame = end = perf_counter()
+
+        self.frames += 1
+        self.draw_time += end - start
+        self.slowest = max(self.slowest, end - start)
+
+    def stats(self):
+        return {
+            "updates": self.updates,
+            "frames": self.frames,
+            "avg_ms": round(self.draw_time / max(self.frames, 1) * 1000, 2),
+            "max_ms": round(self.slowest * 1000, 2),
+        }
+
+    def _frame_due(self, loop, user_data):
+        # Entering idle after this alarm draws the frame.
+        self.frame_alarm = None
+        self.frame_due = True
 
 
 class PlayBar(urwid.ProgressBar):
@@ -268,12 +597,14 @@ class PlayBar(urwid.ProgressBar):
 
         super(PlayBar, self).__init__(*args, **kwargs)
         self.app = app
+        self.maxcol = None
+        self.shown = None
 
     def get_prog_tot(self):
 
-        progress = self.app.player.time_pos or 0
-        remaining = self.app.player.time_remaining or 0
-        total = progress + remaining
+        # kept up to date by the mpv property observers
+        progress = self.app.time_pos or 0
+        total = self.app.duration or 0
 
         return progress, total
 
@@ -304,23 +635,118 @@ class PlayBar(urwid.ProgressBar):
             self.vol_inds[self.app.volume],
         )
 
-    def update(self):
-        self._invalidate()
+    def render(self, size, focus=False):
+        self.maxcol = size[0]
+        return super(PlayBar, self).render(size, focus)
 
+    def update(self):
+        """Invalidate the bar if its text or filled cells have changed."""
         progress, total = self.get_prog_tot()
         if progress >= 0 and total > 0:
-            percent = progress / total * 100
-            self.set_completion(percent)
+            percent = min(progress / total * 100, 100)
         else:
-            self.set_completion(0)
+            percent = 0
+
+        cells = int(percent * self.maxcol / 100) if self.maxcol else percent
+        shown = (self.get_text(), cells)
+
+        if shown == self.shown:
+            return False
+
+        self.shown = shown
+        self.set_completion(percent)
+        self._invalidate()
+        return True
+
+
+class LazyWalker(urwid.ListWalker):
+    """List walker that builds row widgets on demand.
+
+    ``length()`` returns the number of rows and ``make_widget(position)``
+    builds the widget of a row. Only widgets of rows close to the focus are
+    kept, so the cost of a list does not depend on its length.
+    """
+
+    MARGIN = 200
+
+    def __init__(self, length, make_widget):
+        self.length = length
+        self.make_widget = make_widget
+        self.focus = 0
+        self.widgets = {}  # position -> widget
+
+    def __len__(self):
+        return self.length()
+
+    def widget(self, position):
+        try:
+            return self.widgets[position]
+        except KeyError:
+            widget = self.widgets[position] = self.make_widget(position)
+            return widget
+
+    def get_focus(self):
+        if not self.length():
+            return None, None
+
+        return self.widget(self.focus), self.focus
+
+    def set_focus(self, position):
+        self.focus = position
+
+        if len(self.widgets) > 2 * self.MARGIN:
+            self.widgets = {
+                pos: widget
+                for pos, widget in self.widgets.items()
+                if abs(pos - position) <= self.MARGIN
+            }
+
+        self._modified()
+
+    def get_next(self, position):
+        if position + 1 >= self.length():
+            return None, None
+
+        return self.widget(position + 1), position + 1
+
+    def get_prev(self, position):
+        if position <= 0:
+            return None, None
+
+        return self.widget(position - 1), position - 1
+
+    def positions(self, reverse=False):
+        positions = range(self.length())
+        return reversed(positions) if reverse else positions
+
+    def inserted(self, position):
+        # keep the focus on the same row, like SimpleFocusListWalker
+        if self.length() > 1 and position <= self.focus:
+            self.focus += 1
+
+        self.changed()
+
+    def removed(self, position):
+        if position < self.focus:
+            self.focus -= 1
+
+        self.changed()
+
+    def changed(self):
+        self.focus = max(0, min(self.focus, self.length() - 1))
+        self.widgets.clear()
+        self._modified()
 
 
 class QueuePanel(urwid.ListBox):
     def __init__(self, app):
 
         self.app = app
-        self.walker = urwid.SimpleFocusListWalker([])
-        self.queue = []
+        self.queue = PlayQueue()
+        self.journal = None  # QueueJournal, if the queue is persisted
+        self.walker = LazyWalker(
+            lambda: len(self.queue), lambda position: self.queue[position].ui()
+        )
         super().__init__(self.walker)
 
     def add_song_to_queue(self, song, to_front=False):
@@ -328,12 +754,19 @@ class QueuePanel(urwid.ListBox):
         if song:
 
             if to_front:
-                self.queue.insert(0, song)
-                self.walker.insert(0, song.ui())
+                self.queue.appendleft(song)
+                idx = 0
 
             else:
                 self.queue.append(song)
-                self.walker.append(song.ui())
+                idx = len(self.queue) - 1
+
+            self.walker.inserted(idx)
+
+            if self.journal:
+                self.journal.add(idx, song)
+
+            self.app.queue_changed()
 
     def add_songs_to_queue(self, songs, to_front=False):
 
@@ -344,7 +777,7 @@ class QueuePanel(urwid.ListBox):
 
     def add_album_to_queue(self, album, to_front=False):
 
-        album_info = self.app.g_api.get_album_info(album.id)
+        album_info = self.app.get_album_info(album.id)
         track_list = (
             reversed(album_info["tracks"]) if to_front else album_info["tracks"]
         )
@@ -357,67 +790,91 @@ class QueuePanel(urwid.ListBox):
 
         if 0 <= idx < len(self.queue):
             self.queue.pop(idx)
-            self.walker.pop(idx)
+            self.walker.removed(idx)
+
+            if self.journal:
+                self.journal.remove(idx)
+
+            self.app.queue_changed()
 
     def clear(self):
         self.queue.clear()
-        self.walker.clear()
+        self.walker.changed()
+        self.app.radio_station = None  # an emptied queue ends the radio
+
+        if self.journal:
+            self.journal.clear()
+
+        self.app.queue_changed()
 
     def swap(self, idx1, idx2):
 
         if (0 <= idx1 < len(self.queue)) and (0 <= idx2 < len(self.queue)):
 
-            obj1, obj2 = self.queue[idx1], self.queue[idx2]
-            self.queue[idx1], self.queue[idx2] = obj2, obj1
+            self.queue.swap(idx1, idx2)
+            self.walker.changed()
+
+            if self.journal:
+                self.journal.swap(idx1, idx2)
+
+            self.app.queue_changed()
+
+    def move(self, src, dst):
 
-            ui1, ui2 = self.walker[idx1], self.walker[idx2]
-            self.walker[idx1], self.walker[idx2] = ui2, ui1
+        self.queue.move(src, dst)
+        self.walker.changed()
+
+        if self.journal:
+            self.journal.move(src, dst)
+
+        self.app.queue_changed()
 
     def to_top(self, idx):
 
         if 0 <= idx < len(self.queue):
-            obj = self.queue[idx]
-            del self.queue[idx]
-            self.queue = [obj] + self.queue
-
-            ui = self.walker[idx]
-            del self.walker[idx]
-            self.walker.insert(0, ui)
+            self.move(idx, 0)
 
     def to_bottom(self, idx):
 
         if 0 <= idx < len(self.queue):
-            obj = self.queue[idx]
-            del self.queue[idx]
-            self.queue.append(obj)
-
-            ui = self.walker[idx]
-            del self.walker[idx]
-            self.walker.append(ui)
+            self.move(idx, len(self.queue) - 1)
 
     def shuffle(self):
-        from random import shuffle
+        from random import Random, getrandbits
 
-        shuffle(self.queue)
+        # seeded so that the journal can replay the same order
+        seed = getrandbits(32)
+        self.queue.shuffle(Random(seed))
+        self.walker.changed()
 
-        self.walker.clear()
-        for s in self.queue:
-            self.walker.append(s.ui())
+        if self.journal:
+            self.journal.shuffle(seed)
+
+        self.app.queue_changed()
+
+    def pop_next(self):
+
+        obj = self.queue.popleft()
+        self.walker.removed(0)
+
+        if self.journal:
+            self.journal.pop()
+
+        return obj
 
     def play_next(self):
 
-        while self.walker:
-            self.walker.pop(0)
-            next_song = self.queue.pop(0)
+        while self.queue:
+            next_song = self.pop_next()
 
             if self.app.play(next_song):
-                
-                next_song.lastfm_scrobbled = False
-                if self.app.lastfm and isinstance(next_song, Song):
-                    self.app.lastfm.update_now_playing_song(next_song)
                 break
         else:
             self.app.current_song = None
+
+            if self.journal:
+                self.journal.current(None)
+
             self.app.stop()
 
     def play_previous(self):
@@ -1,47 +1,157 @@
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+
+
 def sec_to_min_sec(sec_tot):
     s = int(sec_tot or 0)
     return s // 60, s % 60
 
 
+class RecentSet:
+    """The last ``size`` distinct keys added, with O(1) membership tests."""
+
+    def __init__(self, size=500):
+        self.size = size
+        self.order = deque()
+        self.keys = set()
+
+    def add(self, key):
+        if key in self.keys:
+            return
+
+        self.order.append(key)
+        self.keys.add(key)
+
+        if len(self.order) > self.size:
+            self.keys.discard(self.order.popleft())
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.order)
+
+    def recent(self, n):
+        """The ``n`` keys added last, oldest first."""
+        return list(self.order)[-n:]
+
+
+class StartupTimer:
+    """Wall time spent in each phase of startup."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def report(self):
+        lines = [
+            f"  {name:<10}{seconds * 1000:8.1f} ms"
+            for name, seconds in self.phases.items()
+        ]
+        lines.append(f"  {'total':<10}{self.total() * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+# Every key a session may use. They are requested from the key server
+# together so that it is contacted at most once.
+SESSION_KEYS = ("GOOGLE_DEVELOPER_KEY", "LASTFM_API_KEY", "LASTFM_API_SECRET")
+KEY_CACHE_TTL = 7 * 24 * 60 * 60
+KEY_SERVER = "https://tuijam.fangmeier.tech"
+
+_keys = {}  # keys resolved during this session
+
+
+def _load_key_cache(path, now):
+    import json
+
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    return {id_: (key, expiry) for id_, (key, expiry) in cache.items() if expiry > now}
+
+
+def _save_key_cache(path, cache):
+    import json
+    from tuijam.cache import write_atomic
+
+    # The cache holds API secrets: only the user may read it.
+    write_atomic(path, json.dumps(cache), mode=0o600)
+
+
 def lookup_keys(*key_ids):
     import base64
+    import logging
+    import time
     import yaml
     import rsa
-    import requests
 
-    from tuijam import CONFIG_FILE
+    from tuijam import CONFIG_FILE, KEY_CACHE_FILE, net
+
+    missing = [id_ for id_ in key_ids if id_ not in _keys]
+
+    if missing:
+        # First, check if any are in configuration file
+        with open(CONFIG_FILE, "r") as f:
+            cfg = yaml.safe_load(f)
+
+        for id_ in missing:
+            if id_ in cfg:
+                _keys[id_] = cfg[id_]
+
+        # Then the local key cache
+        now = time.time()
+        cache = _load_key_cache(KEY_CACHE_FILE, now)
+        for id_ in missing:
+            if id_ not in _keys and id_ in cache:
+                _keys[id_] = cache[id_][0]
+
+        # Finally, ask the server for everything still unknown, including the
+        # other keys this session is going to need.
+        to_query = [
+            id_
+            for id_ in dict.fromkeys(missing + list(SESSION_KEYS))
+            if id_ not in _keys and id_ not in cfg and id_ not in cache
+        ]
+
+        if any(id_ not in _keys for id_ in missing):
+            # Generate new RSA key pair. Do not reuse keys!
+            (pub, priv) = rsa.newkeys(512)
+            host = cfg.get("key_server", KEY_SERVER)
+
+            res = net.post(
+                host, json={"public_key": pub.save_pkcs1().decode(), "ids": to_query}
+            )
+
+            expiry = now + cfg.get("key_cache_ttl", KEY_CACHE_TTL)
+            for id_, key_encrypted in res.json().items():
+                # On the server, the api key is encrypted with the public RSA key,
+                # and then base64 encoded to be delivered. Reverse that process here.
+                key_decrypted = rsa.decrypt(
+                    base64.decodebytes(key_encrypted.encode()), priv
+                ).decode()
+                _keys[id_] = key_decrypted
+                cache[id_] = (key_decrypted, expiry)
 
-    keys = [None] * len(key_ids)
-    # First, check if any are in configuration file
-    with open(CONFIG_FILE, "r") as f:
-        cfg = yaml.safe_load(f)
-        for idx, id_ in enumerate(key_ids):
             try:
-                keys[idx] = cfg[id_]
-            except KeyError:
-                pass
-
-    # Next, if any unspecified in config file, ask the server for them
-    to_query = {}
-    for idx, (id_, key) in enumerate(zip(key_ids, keys)):
-        if key is None:
-            # keep track of position of each key so output order matches
-            to_query[id_] = idx
-
-    if to_query:
-        (pub, priv) = rsa.newkeys(512)  # Generate new RSA key pair. Do not reuse keys!
-        host = cfg.get("key_server", "https://tuijam.fangmeier.tech")
-
-        res = requests.post(
-            host, json={"public_key": pub.save_pkcs1().decode(), "ids": list(to_query)}
-        )
-
-        for id_, key_encrypted in res.json().items():
-            # On the server, the api key is encrypted with the public RSA key,
-            # and then base64 encoded to be delivered. Reverse that process here.
-            key_decrypted = rsa.decrypt(
-                base64.decodebytes(key_encrypted.encode()), priv
-            ).decode()
-            keys[to_query[id_]] = key_decrypted
-
-    return keys
+                _save_key_cache(KEY_CACHE_FILE, cache)
+            except OSError as e:
+                logging.exception(e)
+
+    return [_keys.get(id_) for id_ in key_ids]
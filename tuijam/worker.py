@@ -0,0 +1,146 @@
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class ThreadPool:
+    """Daemon threads running calls from a queue, returning futures.
+
+    Unlike ThreadPoolExecutor, whose threads are joined at exit, quitting
+    never waits for a call still running, e.g. a request without a timeout.
+    """
+
+    def __init__(self, max_workers, name):
+        self.calls = queue.SimpleQueue()
+        self.stopped = False
+        self.threads = [
+            threading.Thread(target=self._run, name=f"{name}_{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.calls.put((future, fn, args, kwargs))
+        return future
+
+    def shutdown(self):
+        """Cancel the calls not started yet and let the threads exit."""
+        self.stopped = True
+
+        while True:
+            try:
+                call = self.calls.get_nowait()
+            except queue.Empty:
+                break
+            if call is not None:
+                call[0].cancel()
+
+        for _ in self.threads:
+            self.calls.put(None)
+
+    def _run(self):
+        while True:
+            call = self.calls.get()
+            if call is None or self.stopped:
+                return
+
+            future, fn, args, kwargs = call
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+class Worker:
+    """Runs blocking calls off the UI thread and hands their results back to it.
+
+    Callbacks are queued and run by the urwid main loop, which is woken up
+    through a pipe registered with ``MainLoop.watch_pipe``. Until a loop is
+    attached callbacks simply accumulate.
+
+    Long jobs go to a thread of their own, so that searches and playback
+    don't wait behind them.
+    """
+
+    def __init__(self, max_workers=4):
+        self.executor = ThreadPool(max_workers, "tuijam")
+        self.background = ThreadPool(1, "tuijam_background")
+        self.pending = deque()
+        self.wake_fd = None
+        self.wake_lock = threading.Lock()
+        self.woken = False
+
+    def attach(self, loop):
+        self.wake_fd = loop.watch_pipe(self._run_pending)
+        if self.pending:
+            self._wake()
+
+    def submit(self, fn, *args, callback=None, **kwargs):
+        return self._submit(self.executor, fn, args, kwargs, callback)
+
+    def submit_long(self, fn, *args, callback=None, **kwargs):
+        """Like ``submit``, for jobs that take long, e.g. indexing the library."""
+        return self._submit(self.background, fn, args, kwargs, callback)
+
+    def call_soon(self, fn, *args):
+        """Schedule ``fn(*args)`` on the UI thread. Safe to call from any thread."""
+        self.pending.append((fn, args))
+        self._wake()
+
+    def shutdown(self):
+        self.executor.shutdown()
+        self.background.shutdown()
+
+    def _submit(self, pool, fn, args, kwargs, callback):
+        future = pool.submit(fn, *args, **kwargs)
+
+        if callback is not None:
+            future.add_done_callback(lambda f: self._done(f, callback))
+
+        return future
+
+    def _done(self, future, callback):
+        if future.cancelled():
+            return
+
+        try:
+            result = future.result()
+        except Exception as e:
+            logging.exception(e)
+            return
+
+        self.call_soon(callback, result)
+
+    def _wake(self):
+        with self.wake_lock:
+            if self.woken or self.wake_fd is None:
+                return
+            self.woken = True
+
+        try:
+            os.write(self.wake_fd, b"\0")
+        except OSError:
+            pass
+
+    def _run_pending(self, data):
+        with self.wake_lock:
+            self.woken = False
+
+        while self.pending:
+            fn, args = self.pending.popleft()
+            try:
+                fn(*args)
+            except Exception as e:
+                logging.exception(e)
+
+        return True